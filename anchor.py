@@ -0,0 +1,171 @@
+"""
+Locate the title block on each page so one layout works across sheet sizes.
+
+``bounding_boxes.json`` stores absolute coordinates from the sample PDF, which
+only fit sheets of the same size. A layout may carry an ``_anchor`` entry that
+records where the title block was on the sample page, either as the frame
+drawn around it or as the position of a keyword such as "DRAWING No.":
+
+    "_anchor": {"type": "frame", "rect": [x0, y0, x1, y1]}
+    "_anchor": {"type": "keyword", "keyword": "DRAWING No.", "rect": [...]}
+
+At run time the anchor is found again on each page and every area is moved
+by the same offset (and optionally scaled by the frame size). Text, drawings
+and search hits share the unrotated page space, so rotated pages need no
+special handling beyond ranking candidates in display space.
+
+Add an anchor to an existing layout with:
+
+    python anchor.py bounding_boxes.json sample.pdf [--keyword "DRAWING No."]
+"""
+import fitz  # PyMuPDF
+
+ANCHOR_KEY = '_anchor'
+SIZE_TOLERANCE = 0.02  # Frames within 2% (or 2 pt) of the reference size match
+
+
+def split_layout(layout):
+    """Return ``(areas, anchor)``; ``anchor`` is None for plain absolute layouts."""
+    areas = {name: coords for name, coords in layout.items() if name != ANCHOR_KEY}
+    return areas, layout.get(ANCHOR_KEY)
+
+
+def page_class(page):
+    """Key for pages that share a title-block position: unrotated size plus rotation."""
+    r = page.mediabox
+    return round(r.width), round(r.height), page.rotation
+
+
+def _display_corner(page, rect):
+    # Bottom-right-most in the page as displayed, whatever its /Rotate
+    r = fitz.Rect(rect) * page.rotation_matrix
+    return r.x1 + r.y1
+
+
+def _drawing_rects(page):
+    get_drawings = getattr(page, 'get_cdrawings', page.get_drawings)
+    return [fitz.Rect(d['rect']) for d in get_drawings()]
+
+
+def find_frame(page, size=None, contains=None, scale=False):
+    """
+    Find the title-block frame among the page's vector drawings.
+
+    Args:
+        page (fitz.Page): Page to search.
+        size (tuple): (width, height) of the reference frame; with ``scale``
+            only its aspect ratio has to match.
+        contains (fitz.Rect): Pick the smallest frame that encloses this rect
+            instead (used on the sample page to find the frame around the areas).
+        scale (bool): Match by aspect ratio rather than absolute size.
+
+    Returns:
+        fitz.Rect or None
+    """
+    rects = [r for r in _drawing_rects(page) if r.width > 1 and r.height > 1]
+    if contains is not None:
+        enclosing = [r for r in rects if r.contains(contains)]
+        return min(enclosing, key=lambda r: r.width * r.height) if enclosing else None
+
+    ref_w, ref_h = size
+    matches = []
+    for r in rects:
+        if scale:
+            ok = abs(r.width / r.height - ref_w / ref_h) <= SIZE_TOLERANCE * ref_w / ref_h
+        else:
+            ok = (abs(r.width - ref_w) <= max(2, ref_w * SIZE_TOLERANCE) and
+                  abs(r.height - ref_h) <= max(2, ref_h * SIZE_TOLERANCE))
+        if ok:
+            matches.append(r)
+    if not matches:
+        return None
+    return max(matches, key=lambda r: _display_corner(page, r))
+
+
+def find_keyword(page, keyword):
+    """Return the bottom-right-most hit of ``keyword`` on the page, or None."""
+    hits = page.search_for(keyword)
+    return max(hits, key=lambda r: _display_corner(page, r)) if hits else None
+
+
+def detect_anchor(page, anchor):
+    """Find the anchor described by a layout's ``_anchor`` entry on a page."""
+    ref = fitz.Rect(anchor['rect'])
+    if anchor['type'] == 'keyword':
+        return find_keyword(page, anchor['keyword'])
+    return find_frame(page, size=(ref.width, ref.height), scale=anchor.get('scale', False))
+
+
+def project_areas(areas, anchor, found):
+    """
+    Move areas from the sample page to a page where the anchor was ``found``.
+
+    Frames are aligned on their bottom-right corner, keywords on their
+    top-left. If the anchor was not found the areas are returned unchanged.
+    """
+    if found is None:
+        return areas
+    ref = fitz.Rect(anchor['rect'])
+    if anchor['type'] == 'keyword':
+        ref_x, ref_y, new_x, new_y = ref.x0, ref.y0, found.x0, found.y0
+    else:
+        ref_x, ref_y, new_x, new_y = ref.x1, ref.y1, found.x1, found.y1
+    s = found.width / ref.width if anchor.get('scale') and ref.width else 1.0
+
+    projected = {}
+    for name, (x0, y0, x1, y1) in areas.items():
+        projected[name] = (new_x + (x0 - ref_x) * s, new_y + (y0 - ref_y) * s,
+                           new_x + (x1 - ref_x) * s, new_y + (y1 - ref_y) * s)
+    return projected
+
+
+def make_anchor(page, areas, keyword=None, scale=False):
+    """
+    Build the ``_anchor`` entry for a layout drawn on ``page``.
+
+    Without ``keyword``, the anchor is the smallest drawn frame that encloses
+    all areas. Returns None if nothing suitable is found.
+    """
+    if keyword:
+        found = find_keyword(page, keyword)
+        return {'type': 'keyword', 'keyword': keyword, 'rect': list(found)} if found else None
+
+    union = fitz.Rect()
+    for coords in areas.values():
+        union |= fitz.Rect(coords)
+    found = find_frame(page, contains=union)
+    if found is None:
+        return None
+    anchor = {'type': 'frame', 'rect': list(found)}
+    if scale:
+        anchor['scale'] = True
+    return anchor
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Anchor a bounding box layout to the title block.")
+    parser.add_argument("layout", help="bounding_boxes.json to update")
+    parser.add_argument("sample", help="PDF the layout was drawn on")
+    parser.add_argument("--keyword", help="Anchor on this text instead of the title-block frame")
+    parser.add_argument("--scale", action="store_true", help="Scale areas with the detected frame size")
+    args = parser.parse_args()
+
+    with open(args.layout, 'r', encoding='utf-8') as f:
+        layout = json.load(f)
+    areas, _ = split_layout(layout)
+
+    doc = fitz.open(args.sample)
+    anchor = make_anchor(doc.load_page(0), areas, keyword=args.keyword, scale=args.scale)
+    doc.close()
+    if anchor is None:
+        print("No title-block frame or keyword found on the sample page.")
+        sys.exit(1)
+
+    areas[ANCHOR_KEY] = anchor
+    with open(args.layout, 'w', encoding='utf-8') as f:
+        json.dump(areas, f, indent=2)
+    print(f"Anchored {len(areas) - 1} area(s) to {anchor['type']} at {[round(v, 1) for v in anchor['rect']]}")
@@ -0,0 +1,55 @@
+"""
+Per-page extraction time of each text engine over the number of areas.
+
+Also checks that the 'index' engine returns exactly what 'textbox'
+(page.get_textbox per area) returns on the same files.
+
+    python benchmarks/bench_engines.py --fields 1 10 50 --files 20
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract import ENGINES, extract_text_from_pdf  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+
+PAGE_SIZE = (1191, 842)  # A3 landscape, tall enough for a 50-row title block
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark text engines against the number of areas.")
+    parser.add_argument("--fields", type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument("--files", type=int, default=20, help="PDFs per field count")
+    parser.add_argument("--engines", nargs='+', choices=ENGINES, default=list(ENGINES))
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fields in args.fields:
+            pdf_files, bbox_dict = make_corpus(os.path.join(tmp, f"f{fields}"), args.files,
+                                               fields=fields, page_size=PAGE_SIZE)
+            rows = {}
+            for engine in args.engines:
+                start = time.perf_counter()
+                found = [extract_text_from_pdf((p, bbox_dict, False), engine=engine) for p in pdf_files]
+                elapsed = time.perf_counter() - start
+                # Only the area texts; per-file metadata such as duration_ms always differs
+                rows[engine] = [{name: row.get(name) for name in bbox_dict} for row in found]
+                result = {
+                    'engine': engine,
+                    'fields': fields,
+                    'ms_per_page': round(elapsed / len(pdf_files) * 1000, 2),
+                }
+                if engine != 'textbox' and 'textbox' in rows:
+                    result['matches_textbox'] = rows[engine] == rows['textbox']
+                results.append(result)
+                print(f"{fields:>3} fields  {engine:<8} {result['ms_per_page']:>9.2f} ms/page"
+                      + (f"  matches textbox: {result['matches_textbox']}" if 'matches_textbox' in result else ''),
+                      file=sys.stderr)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,72 @@
+"""
+Files/sec of the extraction pool before and after per-worker bbox preloading.
+
+"before" reproduces the original loop: the full bbox_dict pickled into every
+task and ``imap_unordered`` with chunksize 1. "after" is ``extract.extract``
+with the pool initializer, adaptive chunksize and per page-height rects.
+
+    python benchmarks/bench_pool.py --sizes 1000 10000 100000 --fields 10
+"""
+import os
+import sys
+import csv
+import json
+import time
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract import extract, extract_text_from_pdf  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+
+
+def run_before(pdf_files, bbox_dict, csv_path, processes):
+    tasks = [(pdf_path, bbox_dict, False) for pdf_path in pdf_files]
+    with multiprocessing.Pool(processes) as pool, open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['filename'] + list(bbox_dict), extrasaction='ignore')
+        writer.writeheader()
+        for row in pool.imap_unordered(extract_text_from_pdf, tasks):
+            writer.writerow(row)
+
+
+def run_after(pdf_files, bbox_dict, csv_path, processes):
+    extract(pdf_files, bbox_dict, csv_path=csv_path, processes=processes, cache=False)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pool on synthetic PDFs.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument("--fields", type=int, default=10, help="Named areas per title block")
+    parser.add_argument("-j", "--processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--workdir", help="Directory for the generated corpus (default: temp dir)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        for size in args.sizes:
+            corpus_dir = os.path.join(tmp, f"corpus_{size}")
+            pdf_files, bbox_dict = make_corpus(corpus_dir, size, fields=args.fields)
+            csv_path = os.path.join(tmp, "out.csv")
+            before = timed(run_before, pdf_files, bbox_dict, csv_path, args.processes)
+            after = timed(run_after, pdf_files, bbox_dict, csv_path, args.processes)
+            result = {
+                'files': size,
+                'fields': args.fields,
+                'processes': args.processes,
+                'before_files_per_sec': round(size / before, 1),
+                'after_files_per_sec': round(size / after, 1),
+                'speedup': round(before / after, 2),
+            }
+            results.append(result)
+            print(f"{size:>7} files: before {result['before_files_per_sec']:>9.1f}/s  "
+                  f"after {result['after_files_per_sec']:>9.1f}/s  x{result['speedup']}", file=sys.stderr)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,118 @@
+"""
+Synthetic title-block PDFs for the benchmarks.
+
+Each page gets a framed title block in the bottom-right corner with one
+labelled field per named area, and the matching ``bbox_dict`` is returned so
+the files can be fed straight into ``extract.extract``. Pages can also carry
+filler text over the drawing body and embedded raster images, and corpora
+can mix the sheet sizes from ``pagesize.PAGE_SIZES``; mixed corpora get a
+layout anchored to the title-block frame.
+"""
+import os
+import random
+import shutil
+import fitz  # PyMuPDF
+
+TITLE_BLOCK_WIDTH = 400
+FIELD_HEIGHT = 14
+MARGIN = 20
+IMAGE_SIZE = 256  # px; noise, so it compresses about as badly as a scan
+
+FILLER_WORDS = ("WALL DOOR GRID AXIS LEVEL BEAM COLUMN SLAB DETAIL SECTION "
+                "ELEVATION NOTE SEE DWG TYP. MIN. MAX. CLR. FFL +0.00 2400 1200 600").split()
+
+
+def title_block_frame(page_width, page_height, fields):
+    return fitz.Rect(page_width - MARGIN - TITLE_BLOCK_WIDTH,
+                     page_height - MARGIN - fields * FIELD_HEIGHT,
+                     page_width - MARGIN, page_height - MARGIN)
+
+
+def title_block_layout(page_width, page_height, fields):
+    """Return the bbox_dict of a title block with ``fields`` rows anchored bottom-right."""
+    x1 = page_width - MARGIN
+    x0 = x1 - TITLE_BLOCK_WIDTH
+    y1 = page_height - MARGIN
+    bbox_dict = {}
+    for i in range(fields):
+        top = y1 - (fields - i) * FIELD_HEIGHT
+        bbox_dict[f"field_{i:02d}"] = [x0 + 2, top, x1 - 2, top + FIELD_HEIGHT]
+    return bbox_dict
+
+
+def _noise_image():
+    samples = bytes(random.getrandbits(8) for _ in range(IMAGE_SIZE * IMAGE_SIZE * 3))
+    return fitz.Pixmap(fitz.csRGB, IMAGE_SIZE, IMAGE_SIZE, samples, False).tobytes('png')
+
+
+def make_title_block_pdf(path, page_width=842, page_height=595, fields=10, seed=0,
+                         density=0, images=0, pages=1):
+    """
+    Write a PDF whose title block matches ``title_block_layout``.
+
+    Args:
+        density (int): Filler text lines per page outside the title block.
+        images (int): Raster images embedded per page.
+        pages (int): Number of pages; every page gets the title block.
+    """
+    rng = random.Random(seed)
+    bbox_dict = title_block_layout(page_width, page_height, fields)
+    frame = title_block_frame(page_width, page_height, fields)
+    image = _noise_image() if images else None
+
+    doc = fitz.open()
+    for page_no in range(pages):
+        page = doc.new_page(width=page_width, height=page_height)
+        for _ in range(images):
+            x = rng.uniform(MARGIN, page_width / 2)
+            y = rng.uniform(MARGIN, page_height / 2)
+            page.insert_image(fitz.Rect(x, y, x + 150, y + 150), stream=image)
+        for _ in range(density):
+            x = rng.uniform(MARGIN, frame.x0 - 150)
+            y = rng.uniform(MARGIN + 10, page_height - MARGIN)
+            page.insert_text((x, y), " ".join(rng.choices(FILLER_WORDS, k=rng.randint(2, 8))),
+                             fontsize=rng.choice((6, 8, 10)))
+        page.draw_rect(frame, color=(0, 0, 0), width=1)
+        for name, (x0, y0, x1, y1) in bbox_dict.items():
+            page.draw_line((x0 - 2, y1), (x1 + 2, y1), color=(0, 0, 0), width=0.5)
+            page.insert_text((x0 + 2, y1 - 3), f"{name.upper()}: value {seed}-{page_no}-{name[-2:]}",
+                             fontsize=8)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return bbox_dict
+
+
+def make_corpus(out_dir, count, fields=10, page_size=(842, 595), templates=16,
+                page_sizes=None, density=0, images=0, pages=1):
+    """
+    Fill ``out_dir`` with ``count`` PDFs built from a few distinct templates.
+
+    Args:
+        page_sizes (list): (width, height) sheet sizes to cycle through; overrides
+            ``page_size``. With more than one size the returned layout carries an
+            ``_anchor`` on the title-block frame of the first size.
+
+    Returns:
+        tuple: (list of PDF paths, bbox_dict)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    page_sizes = page_sizes or [page_size]
+    template_paths = []
+    for t in range(min(max(templates, len(page_sizes)), count)):
+        width, height = page_sizes[t % len(page_sizes)]
+        path = os.path.join(out_dir, f"drawing_{t:07d}.pdf")
+        make_title_block_pdf(path, width, height, fields, seed=t, density=density,
+                             images=images, pages=pages)
+        template_paths.append(path)
+
+    pdf_paths = list(template_paths)
+    for i in range(len(template_paths), count):
+        path = os.path.join(out_dir, f"drawing_{i:07d}.pdf")
+        shutil.copyfile(template_paths[i % len(template_paths)], path)
+        pdf_paths.append(path)
+
+    width, height = page_sizes[0]
+    bbox_dict = title_block_layout(width, height, fields)
+    if len(page_sizes) > 1:
+        bbox_dict['_anchor'] = {'type': 'frame', 'rect': list(title_block_frame(width, height, fields))}
+    return pdf_paths, bbox_dict
@@ -0,0 +1,162 @@
+"""
+Throughput, latency and memory of the extraction pipeline on a synthetic corpus.
+
+Generates title-block PDFs in the sheet sizes from ``pagesize.PAGE_SIZES``,
+then measures:
+
+- serial: per-stage timings of ``extract_text_from_pdf``'s steps (open,
+  load_page, text extraction, CSV write), per-file latency percentiles, and
+  the latency of ``extract_text_from_pdf`` itself
+- pool: files/sec of ``extract.extract`` with the configured worker count
+- peak RSS of the benchmark process and of the worker processes
+
+Results are written as JSON so runs of different versions can be compared:
+
+    python benchmarks/suite.py --files 500 --sizes A3 A1 --fields 20 --density 200 -o before.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+from extract import (ENGINES, CSVStreamWriter, area_rects, extract,  # noqa: E402
+                     extract_text_from_pdf, open_pdf)
+from anchor import detect_anchor, project_areas, split_layout  # noqa: E402
+from textindex import area_texts  # noqa: E402
+from pagesize import PAGE_SIZES  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def peak_rss_mb(who):
+    if resource is None:
+        return None
+    kb = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(kb / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def summarize(seconds):
+    return {
+        'total_s': round(sum(seconds), 4),
+        'mean_ms': round(sum(seconds) / len(seconds) * 1000, 3) if seconds else None,
+        'p50_ms': round(percentile(seconds, 50) * 1000, 3) if seconds else None,
+        'p99_ms': round(percentile(seconds, 99) * 1000, 3) if seconds else None,
+    }
+
+
+def run_serial(pdf_files, bbox_dict, engine, csv_path):
+    """Time each stage of the per-file work in this process."""
+    areas, anchor = split_layout(bbox_dict)
+    stages = {'open': [], 'load_page': [], 'extract': [], 'csv_write': []}
+    latency = []
+    rows = []
+    for pdf_path in pdf_files:
+        t0 = time.perf_counter()
+        with open_pdf(pdf_path) as doc:
+            t1 = time.perf_counter()
+            page = doc.load_page(0)
+            t2 = time.perf_counter()
+            page_areas = areas if anchor is None else project_areas(areas, anchor, detect_anchor(page, anchor))
+            texts = area_texts(page, area_rects(page_areas, page.rect.height), engine)
+            t3 = time.perf_counter()
+        stages['open'].append(t1 - t0)
+        stages['load_page'].append(t2 - t1)
+        stages['extract'].append(t3 - t2)
+        latency.append(t3 - t0)
+        rows.append(dict(texts, filename=os.path.basename(pdf_path)))
+
+    with CSVStreamWriter(csv_path, ['filename'] + list(areas)) as writer:
+        for row in rows:
+            t0 = time.perf_counter()
+            writer.write(row)
+            stages['csv_write'].append(time.perf_counter() - t0)
+
+    calls = []
+    for pdf_path in pdf_files:
+        t0 = time.perf_counter()
+        extract_text_from_pdf((pdf_path, bbox_dict, False), engine=engine)
+        calls.append(time.perf_counter() - t0)
+
+    return {
+        'files_per_sec': round(len(pdf_files) / sum(latency), 1),
+        'latency': summarize(latency),
+        'extract_text_from_pdf': summarize(calls),
+        'stages': {name: summarize(values) for name, values in stages.items()},
+    }
+
+
+def run_pool(pdf_files, bbox_dict, engine, csv_path, processes):
+    start = time.perf_counter()
+    extract(pdf_files, bbox_dict, csv_path=csv_path, processes=processes, cache=False, engine=engine)
+    elapsed = time.perf_counter() - start
+    return {'processes': processes, 'seconds': round(elapsed, 3),
+            'files_per_sec': round(len(pdf_files) / elapsed, 1)}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pipeline on synthetic PDFs.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--sizes", nargs='+', choices=list(PAGE_SIZES), default=list(PAGE_SIZES))
+    parser.add_argument("--portrait", action="store_true", help="Portrait sheets (default: landscape)")
+    parser.add_argument("--fields", type=int, default=10, help="Named areas per title block")
+    parser.add_argument("--density", type=int, default=100, help="Filler text lines per page")
+    parser.add_argument("--images", type=int, default=0, help="Embedded images per page")
+    parser.add_argument("--pages", type=int, default=1, help="Pages per PDF")
+    parser.add_argument("--engine", choices=ENGINES, default='textbox')
+    parser.add_argument("-j", "--processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--skip-pool", action="store_true", help="Only run the serial stage timings")
+    args = parser.parse_args()
+
+    page_sizes = [PAGE_SIZES[s] if args.portrait else PAGE_SIZES[s][::-1] for s in args.sizes]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        pdf_files, bbox_dict = make_corpus(os.path.join(tmp, 'corpus'), args.files, fields=args.fields,
+                                           page_sizes=page_sizes, density=args.density,
+                                           images=args.images, pages=args.pages)
+        corpus_seconds = time.perf_counter() - start
+        corpus_bytes = sum(os.path.getsize(p) for p in pdf_files)
+
+        csv_path = os.path.join(tmp, 'out.csv')
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pymupdf': fitz.VersionBind,
+            'platform': platform.platform(),
+            'config': vars(args),
+            'corpus': {'files': len(pdf_files), 'bytes': corpus_bytes,
+                       'generate_s': round(corpus_seconds, 2)},
+            'serial': run_serial(pdf_files, bbox_dict, args.engine, csv_path),
+        }
+        if not args.skip_pool:
+            report['pool'] = run_pool(pdf_files, bbox_dict, args.engine, csv_path, args.processes)
+        report['peak_rss_mb'] = {'main': peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                                 'workers': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
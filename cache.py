@@ -0,0 +1,162 @@
+"""
+Persistent extraction cache so re-runs only touch new or changed PDFs.
+
+Files are fingerprinted by path, size, mtime and a content hash. Extracted
+text is stored per area, keyed by a hash of the area's name and coordinates,
+so editing one box in ``bounding_boxes.json`` only re-extracts that column.
+Keys a run no longer uses for a file (edited or removed boxes, other
+settings) are dropped when it stores the file, so the cache holds one layout
+per file.
+OCR text is stored by a hash of the rendered clip (see ``ocr.py``).
+"""
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """Return the BLAKE2b content hash of a file as a hex string."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def area_keys(bbox_dict, variant=''):
+    """
+    Map each area name to a key that changes whenever its name or coordinates change.
+
+    ``variant`` separates entries produced by extraction settings whose output
+    differs, e.g. the ``'words'`` engine.
+    """
+    keys = {}
+    for name, coords in bbox_dict.items():
+        payload = json.dumps([name, [float(c) for c in coords]] + ([variant] if variant else []))
+        keys[name] = hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+    return keys
+
+
+class ExtractionCache:
+    """
+    SQLite store of per-file fingerprints and per-area extracted text.
+
+    Lookups run in the pool's feeder thread while results are stored from the
+    main thread, so the connection is shared and every call holds a lock.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS areas (
+                path TEXT NOT NULL,
+                area_key TEXT NOT NULL,
+                text TEXT,
+                PRIMARY KEY (path, area_key)
+            );
+            CREATE TABLE IF NOT EXISTS ocr (
+                clip_key TEXT PRIMARY KEY,
+                text TEXT NOT NULL
+            );
+        """)
+
+    def lookup(self, pdf_path):
+        """
+        Check a file against the cache.
+
+        Which keys apply can depend on the file's pages, so all of the file's
+        valid entries are returned and the caller picks its keys.
+
+        Args:
+            pdf_path (str): Path of the PDF.
+
+        Returns:
+            tuple: (fingerprint, cached) where ``fingerprint`` is a dict with
+            ``path``, ``size``, ``mtime_ns`` and ``content_hash`` (None when the
+            file is new and still has to be hashed) and ``cached`` maps area
+            keys (see ``area_keys``) to text that is still valid.
+        """
+        path = os.path.abspath(pdf_path)
+        st = os.stat(path)
+        fingerprint = {'path': path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'content_hash': None}
+        with self._lock:
+            return self._lookup(path, st, fingerprint)
+
+    def _lookup(self, path, st, fingerprint):
+        known = self.conn.execute(
+            "SELECT size, mtime_ns, content_hash FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if known is None:
+            return fingerprint, {}
+
+        size, mtime_ns, content_hash = known
+        if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+            # Only hash when the cheap stat check fails, e.g. after a copy or touch
+            fingerprint['content_hash'] = hash_file(path) if size == st.st_size else None
+            if fingerprint['content_hash'] != content_hash:
+                self.conn.execute("DELETE FROM areas WHERE path = ?", (path,))
+                return fingerprint, {}
+            self.conn.execute(
+                "UPDATE files SET mtime_ns = ? WHERE path = ?", (st.st_mtime_ns, path)
+            )
+        fingerprint['content_hash'] = content_hash
+
+        rows = self.conn.execute("SELECT area_key, text FROM areas WHERE path = ?", (path,))
+        return fingerprint, dict(rows.fetchall())
+
+    def store(self, fingerprint, texts, keep=None):
+        """
+        Record a file's fingerprint and newly extracted text.
+
+        Args:
+            fingerprint (dict): As returned by ``lookup``, with ``content_hash`` filled in.
+            texts (dict): Area key -> extracted text.
+            keep (set): All keys the file has in the current layout. Other
+                stored keys of the file are deleted.
+        """
+        with self._lock:
+            if keep is not None:
+                stale = [(fingerprint['path'], key) for key, in self.conn.execute(
+                    "SELECT area_key FROM areas WHERE path = ?", (fingerprint['path'],)) if key not in keep]
+                self.conn.executemany("DELETE FROM areas WHERE path = ? AND area_key = ?", stale)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                (fingerprint['path'], fingerprint['size'], fingerprint['mtime_ns'], fingerprint['content_hash'])
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO areas (path, area_key, text) VALUES (?, ?, ?)",
+                [(fingerprint['path'], key, text) for key, text in texts.items()]
+            )
+
+    def ocr_text(self, clip_key):
+        """Return the OCR text stored for a rendered clip, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT text FROM ocr WHERE clip_key = ?", (clip_key,)).fetchone()
+        return row[0] if row else None
+
+    def store_ocr(self, clip_key, text):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO ocr (clip_key, text) VALUES (?, ?)", (clip_key, text))
+
+    def commit(self):
+        with self._lock:
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
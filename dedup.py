@@ -0,0 +1,98 @@
+"""
+Byte-identical duplicate detection, so each distinct PDF is extracted once.
+
+Archives hold the same drawing many times over: transmittal copies,
+re-issues with identical bytes, and the copies ``sortpdfs.py`` places into
+output folders. Files are narrowed down in three passes, each only over the
+candidates left by the previous one:
+
+1. size (one ``stat`` per file)
+2. a hash of the first and last ``PARTIAL_HASH_SIZE`` bytes; a PDF's trailer
+   and document ID sit at the end, so this separates most same-size files
+3. a full BLAKE2b content hash (``cache.hash_file``)
+
+Files that cannot be read are treated as unique, so the extraction reports them.
+"""
+import os
+import csv
+import hashlib
+from collections import defaultdict
+from cache import hash_file
+
+PARTIAL_HASH_SIZE = 64 * 1024
+
+
+def partial_hash(path, size):
+    """Hash the head and tail of a file; for small files this covers all of it."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        h.update(f.read(PARTIAL_HASH_SIZE))
+        if size > 2 * PARTIAL_HASH_SIZE:
+            f.seek(-PARTIAL_HASH_SIZE, os.SEEK_END)
+        h.update(f.read(PARTIAL_HASH_SIZE))
+    return h.hexdigest()
+
+
+def _regroup(groups, key):
+    """Split each group of paths by ``key(path)``, keeping groups of two or more."""
+    result = []
+    for paths in groups:
+        split = defaultdict(list)
+        for path in paths:
+            try:
+                split[key(path)].append(path)
+            except OSError:
+                continue  # Unreadable: left to the extraction to report
+        result.extend(group for group in split.values() if len(group) > 1)
+    return result
+
+
+def find_duplicates(paths):
+    """
+    Group byte-identical files.
+
+    Args:
+        paths (iterable): File paths, in the order they should be preferred.
+
+    Returns:
+        tuple: (unique, duplicates, sizes) where ``unique`` lists the first
+        path of every distinct file in input order, ``duplicates`` maps such a
+        path to the later paths with identical content, and ``sizes`` maps
+        each path in ``duplicates`` to its size in bytes.
+    """
+    paths = list(dict.fromkeys(paths))
+    by_size = defaultdict(list)
+    sizes = {}
+    for path in paths:
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            continue
+        sizes[path] = size
+        by_size[size].append(path)
+
+    groups = [group for group in by_size.values() if len(group) > 1]
+    groups = _regroup(groups, lambda path: partial_hash(path, sizes[path]))
+    # The partial hash already covered every byte of small files
+    small = [group for group in groups if sizes[group[0]] <= 2 * PARTIAL_HASH_SIZE]
+    large = [group for group in groups if sizes[group[0]] > 2 * PARTIAL_HASH_SIZE]
+    groups = small + _regroup(large, hash_file)
+
+    duplicates, skipped = {}, set()
+    order = {path: i for i, path in enumerate(paths)}
+    for group in groups:
+        group.sort(key=order.__getitem__)
+        duplicates[group[0]] = group[1:]
+        skipped.update(group[1:])
+    unique = [path for path in paths if path not in skipped]
+    return unique, duplicates, {path: sizes[path] for path in duplicates}
+
+
+def write_duplicate_report(path, duplicates, sizes):
+    """Write one ``original,duplicate,size`` row per skipped file."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['original', 'duplicate', 'size'])
+        for original, copies in duplicates.items():
+            for copy in copies:
+                writer.writerow([original, copy, sizes[original]])
@@ -0,0 +1,122 @@
+"""
+Streaming discovery of PDFs in nested folders.
+
+``os.scandir`` is walked depth-first with an explicit stack and paths are
+yielded in directory order as the entries are read, so a worker pool can
+start on the first files while the rest of a large archive (or of one flat
+folder with millions of files) is still being listed. Only the subfolders of
+the folder being read are held back. ``sort=True`` yields each folder's
+entries in name order instead, which reads the whole folder first.
+
+Include and exclude patterns are ``fnmatch`` globs matched against both the
+path relative to the input folder (with ``/`` separators) and the bare name:
+
+    include=['*_TB.pdf']            only files ending in _TB.pdf
+    exclude=['superseded', '*/old/*']   skip those folders and anything under old/
+"""
+import os
+from fnmatch import fnmatch
+
+PDF_EXTENSION = '.pdf'
+
+
+def _matches(rel_path, name, patterns):
+    return any(fnmatch(rel_path, p) or fnmatch(name, p) for p in patterns)
+
+
+def walk_files(root, recursive=True, include=(), exclude=(), follow_symlinks=True, on_error=None,
+               sort=False):
+    """
+    Yield ``(path, rel_path)`` for the files under ``root``.
+
+    Files of a folder come before its subfolders. Entries are in the order
+    the file system returns them unless ``sort`` is set.
+
+    Args:
+        root (str): Folder to walk.
+        recursive (bool): Descend into subfolders.
+        include (list): If given, only files matching one of these globs are yielded.
+        exclude (list): Files and folders matching any of these globs are skipped;
+            excluded folders are not descended into.
+        follow_symlinks (bool): Follow symlinked folders and files. Each folder
+            is visited once by device and inode, so symlink loops terminate.
+        on_error (callable): Called with the ``OSError`` for a folder that
+            cannot be read. Such folders are skipped.
+        sort (bool): Yield each folder's entries in name order. The whole
+            folder is listed before its first file is yielded.
+    """
+    try:
+        st = os.stat(root)
+    except OSError as e:
+        if on_error:
+            on_error(e)
+        return
+    visited = {(st.st_dev, st.st_ino)}
+    stack = [(root, '')]
+    while stack:
+        folder, rel_folder = stack.pop()
+        subfolders = []
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda e: e.name) if sort else it
+                for entry in entries:
+                    rel_path = rel_folder + entry.name
+                    if exclude and _matches(rel_path, entry.name, exclude):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            if recursive:
+                                st = entry.stat(follow_symlinks=follow_symlinks)
+                                if (st.st_dev, st.st_ino) not in visited:
+                                    visited.add((st.st_dev, st.st_ino))
+                                    subfolders.append((entry.path, rel_path + '/'))
+                            continue
+                        if not entry.is_file(follow_symlinks=follow_symlinks):
+                            continue
+                    except OSError:
+                        continue  # Dangling symlink or vanished entry
+                    if include and not _matches(rel_path, entry.name, include):
+                        continue
+                    yield entry.path, rel_path
+        except OSError as e:
+            if on_error:
+                on_error(e)
+
+        # Files of a folder come before its subfolders, subfolders in listing order
+        stack.extend(reversed(subfolders))
+
+
+def iter_pdf_files(inputs, recursive=False, include=(), exclude=(), follow_symlinks=True,
+                   on_other=None, on_error=None, sort=False):
+    """
+    Expand folders and file paths into a stream of PDF paths.
+
+    Folders are walked with ``walk_files`` and files ending in ``.pdf`` in any
+    case are yielded; file paths given directly are passed through unchanged.
+
+    Args:
+        inputs (str | list): A folder, a PDF path, or a list of either.
+        recursive (bool): Search subfolders too.
+        include (list): Globs a discovered file must match.
+        exclude (list): Globs for files and folders to skip.
+        follow_symlinks (bool): Follow symlinked folders and files.
+        on_other (callable): Called with the path of every discovered file
+            that is not a PDF.
+        on_error (callable): Called with the ``OSError`` for unreadable folders.
+        sort (bool): List each folder in name order (see ``walk_files``).
+
+    Yields:
+        str: Path of each PDF, as soon as its folder has been listed.
+    """
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    for path in inputs:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for file_path, _ in walk_files(path, recursive, include, exclude, follow_symlinks, on_error, sort):
+            if file_path.lower().endswith(PDF_EXTENSION):
+                yield file_path
+            elif on_other:
+                on_other(file_path)
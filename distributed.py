@@ -0,0 +1,493 @@
+"""
+Extraction spread over several machines through a shared job queue.
+
+The coordinator lists the input folders, splits the files into shards of
+``shard_size`` and puts them on a queue; stateless workers on any number of
+nodes lease a shard, extract it with a local process pool, push the rows back
+and lease the next one. When every shard is done the coordinator merges the
+rows, in input order, into one output file:
+
+    python distributed.py coordinate /archive --bbox bounding_boxes.json --queue /shared/q.sqlite -r
+    python distributed.py work /shared/q.sqlite            # on each node
+
+A lease expires unless its worker heartbeats, so the shards of a crashed or
+partitioned worker go back to the queue and are retried elsewhere, up to
+``max_attempts`` times; a shard that keeps failing is reported with an error
+row per file instead of stalling the run. Workers only need the queue path;
+the layout and extraction settings are stored in the queue.
+
+Backends implement ``put``, ``seal``, ``queued``, ``lease``, ``heartbeat``,
+``complete``, ``fail``, ``reap``, ``counts``, ``results`` and the ``config`` accessors, and are
+registered in ``QUEUE_BACKENDS`` by URL scheme. ``SQLiteQueue`` needs a file
+system with working POSIX locks (a local disk, or NFSv4 / SMB with locking)
+and reasonably synchronized clocks (NTP) on all nodes for lease expiry. File
+paths are stored as absolute paths, so the PDFs must be mounted at the same
+path on every node.
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+import multiprocessing
+from extract import (CSV_NAME, STREAM_CHUNKSIZE, ErrorLog, _extract_indexed, _failed_result, _init_worker,
+                     _prepare_jobs, load_bbox_dict, output_fields)
+from discover import iter_pdf_files
+from layouts import LayoutSet, check_pages
+from textindex import ENGINES
+from sinks import OUTPUT_FORMATS, format_for_path, open_sink, require_pyarrow
+from supervisor import SupervisedPool
+
+SHARD_SIZE = 50
+LEASE_SECONDS = 300.0
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 2.0
+# A worker renews its lease while a file runs, so without a timeout a hung
+# file would hold its shard forever
+FILE_TIMEOUT = 600.0
+
+
+class SQLiteQueue:
+    """
+    Shard queue in one SQLite file, shared by the coordinator and all workers.
+
+    Every state change runs in an ``IMMEDIATE`` transaction, so two workers
+    can never lease the same shard. A shard is ``pending``, ``leased`` (until
+    ``lease_expires``), ``done`` or ``failed``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()  # The heartbeat thread shares the connection
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS shards (
+                id INTEGER PRIMARY KEY,
+                paths TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_expires REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS shards_state ON shards (state, id);
+            CREATE TABLE IF NOT EXISTS results (
+                shard_id INTEGER PRIMARY KEY,
+                rows TEXT NOT NULL
+            );
+        """)
+
+    def _transaction(self, fn, *args):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(*args)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def set_config(self, config):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('config', ?)", (json.dumps(config),))
+
+    def config(self):
+        """The run's settings, or None before the coordinator has stored them."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, paths):
+        """Add one shard of file paths."""
+        with self._lock:
+            self.conn.execute("INSERT INTO shards (paths) VALUES (?)", (json.dumps(paths),))
+
+    def seal(self):
+        """Mark the shard list complete, so idle workers know when to exit."""
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('sealed', '1')")
+
+    def sealed(self):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM meta WHERE key = 'sealed'").fetchone() is not None
+
+    def queued(self):
+        """Set of every file path already put on the queue."""
+        with self._lock:
+            rows = self.conn.execute("SELECT paths FROM shards").fetchall()
+        return {path for (paths,) in rows for path in json.loads(paths)}
+
+    def lease(self, owner, lease_seconds, max_attempts):
+        """
+        Lease the first pending shard, or one whose lease has expired.
+
+        Returns:
+            tuple: (shard_id, paths), or None if nothing can be leased now.
+        """
+        def lease():
+            now = time.time()
+            while True:
+                row = self.conn.execute(
+                    "SELECT id, paths, attempts FROM shards WHERE state = 'pending'"
+                    " OR (state = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1", (now,)
+                ).fetchone()
+                if row is None:
+                    return None
+                shard_id, paths, attempts = row
+                if attempts >= max_attempts:
+                    # Its last worker died or hung mid-shard every time
+                    self.conn.execute(
+                        "UPDATE shards SET state = 'failed', owner = NULL,"
+                        " error = coalesce(error, 'lease expired') WHERE id = ?", (shard_id,))
+                    continue
+                self.conn.execute(
+                    "UPDATE shards SET state = 'leased', owner = ?, lease_expires = ?,"
+                    " attempts = attempts + 1 WHERE id = ?", (owner, now + lease_seconds, shard_id))
+                return shard_id, json.loads(paths)
+        return self._transaction(lease)
+
+    def heartbeat(self, shard_id, owner, lease_seconds):
+        """Extend a lease; False if the shard was reassigned in the meantime."""
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE shards SET lease_expires = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                (time.time() + lease_seconds, shard_id, owner))
+            return cur.rowcount == 1
+
+    def complete(self, shard_id, owner, rows):
+        """Store a shard's rows; False (and nothing stored) if the lease was lost."""
+        def complete():
+            cur = self.conn.execute(
+                "UPDATE shards SET state = 'done', lease_expires = NULL"
+                " WHERE id = ? AND owner = ? AND state = 'leased'", (shard_id, owner))
+            if cur.rowcount != 1:
+                return False
+            self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (shard_id, json.dumps(rows)))
+            return True
+        return self._transaction(complete)
+
+    def fail(self, shard_id, owner, error, max_attempts):
+        """Return a shard to the queue after an error, or fail it for good after ``max_attempts``."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE shards SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                " owner = NULL, lease_expires = NULL, error = ? WHERE id = ? AND owner = ?",
+                (max_attempts, error, shard_id, owner))
+
+    def reap(self, max_attempts):
+        """Fail shards whose last allowed lease expired, even with no worker left to lease them."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE shards SET state = 'failed', owner = NULL, error = coalesce(error, 'lease expired')"
+                " WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?", (time.time(), max_attempts))
+
+    def counts(self):
+        """Number of shards in each state."""
+        with self._lock:
+            return dict(self.conn.execute("SELECT state, count(*) FROM shards GROUP BY state"))
+
+    def results(self):
+        """
+        Yield ``(paths, rows, error)`` for every shard in input order.
+
+        ``rows`` is None for failed shards, with ``error`` giving the reason.
+        """
+        # One shard at a time, so the merge holds a single shard's rows
+        last = -1
+        while True:
+            with self._lock:
+                shard = self.conn.execute(
+                    "SELECT s.id, s.paths, s.error, r.rows FROM shards s"
+                    " LEFT JOIN results r ON r.shard_id = s.id WHERE s.id > ? ORDER BY s.id LIMIT 1",
+                    (last,)).fetchone()
+            if shard is None:
+                return
+            last, paths, error, rows = shard
+            yield json.loads(paths), json.loads(rows) if rows is not None else None, error
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+QUEUE_BACKENDS = {'sqlite': SQLiteQueue}
+
+
+def open_queue(url):
+    """Open a queue from ``scheme://location``; a bare path is a SQLite queue."""
+    scheme, sep, location = url.partition('://')
+    if not sep:
+        scheme, location = 'sqlite', url
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown queue backend: {scheme}")
+    return QUEUE_BACKENDS[scheme](location)
+
+
+class _Heartbeat(threading.Thread):
+    """Keep a shard's lease alive while the worker extracts it."""
+
+    def __init__(self, queue, shard_id, owner, lease_seconds):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.shard_id = shard_id
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(self.shard_id, self.owner, self.lease_seconds):
+                self.lost = True
+                return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def work(queue_url, processes=None, worker_id=None, timeout=FILE_TIMEOUT, poll_interval=POLL_INTERVAL):
+    """
+    Lease and extract shards until the coordinator's queue is finished.
+
+    Args:
+        queue_url (str): The queue the coordinator created.
+        processes (int): Local worker processes. Defaults to ``multiprocessing.cpu_count()``.
+        worker_id (str): Lease owner name. Defaults to ``<hostname>:<pid>``.
+        timeout (float): Seconds a single task (a file, or a batch of a long
+            set's pages) may take before its worker is killed and the task
+            reported as failed. None or 0 waits forever.
+        poll_interval (float): Seconds between polls while no shard is available.
+
+    Returns:
+        dict: ``shards`` and ``files`` completed by this worker.
+    """
+    queue = open_queue(queue_url)
+    config = queue.config()
+    while config is None:
+        time.sleep(poll_interval)  # Started before the coordinator
+        config = queue.config()
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    layouts = LayoutSet(config['layout'])
+    lease_seconds, max_attempts = config['lease_seconds'], config['max_attempts']
+    options = {'engine': config['engine'], 'min_overlap': config['min_overlap'],
+               'open_mode': config['open_mode'], 'pages': config['pages']}
+    processes = processes or multiprocessing.cpu_count()
+    if timeout:
+        pool = SupervisedPool(processes, _init_worker, (layouts, False, options), timeout=timeout,
+                              on_failure=_failed_result)
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker, (layouts, False, options))
+
+    done = {'shards': 0, 'files': 0}
+    with pool:
+        while True:
+            shard = queue.lease(worker_id, lease_seconds, max_attempts)
+            if shard is None:
+                counts = queue.counts()
+                if queue.sealed() and not counts.get('pending') and not counts.get('leased'):
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            shard_id, paths = shard
+            heartbeat = _Heartbeat(queue, shard_id, worker_id, lease_seconds)
+            heartbeat.start()
+            try:
+                tasks = _prepare_jobs(paths, layouts, False, None, config['pages'])
+                chunksize = max(1, min(STREAM_CHUNKSIZE, len(paths) // processes))
+                results = list(pool.imap_unordered(_extract_indexed, enumerate(tasks), chunksize))
+                # The remaining pages of large planned files, spread over the pool too
+                page_tasks = [(idx, task) for idx, _, _, rest in results for task in rest]
+                if page_tasks:
+                    results += pool.imap_unordered(_extract_indexed, page_tasks)
+            except Exception as e:
+                heartbeat.stop()
+                queue.fail(shard_id, worker_id, f"{e} (worker: {worker_id})", max_attempts)
+                continue
+            heartbeat.stop()
+            by_file = {}
+            for idx, file_rows, _, _ in results:
+                by_file.setdefault(idx, []).extend(file_rows)
+            rows = [row for idx in sorted(by_file) for row in sorted(by_file[idx], key=lambda row: row['page'])]
+            if not heartbeat.lost and queue.complete(shard_id, worker_id, rows):
+                done['shards'] += 1
+                done['files'] += len(paths)
+    queue.close()
+    return done
+
+
+def coordinate(inputs, bbox, queue_url, csv_path=None, shard_size=SHARD_SIZE, lease_seconds=LEASE_SECONDS,
+               max_attempts=MAX_ATTEMPTS, recursive=False, include=(), exclude=(), pages=None,
+               engine='textbox', min_overlap=0.0, open_mode='file', output_format=None, metadata=False,
+               resume=False, local_workers=0, poll_interval=POLL_INTERVAL, progress=None):
+    """
+    Queue the inputs in shards, wait for the workers and merge their rows.
+
+    Args:
+        inputs (str | list): Folders and/or PDF paths, as for ``extract.extract``.
+        bbox (str | dict): Bounding box JSON or the loaded dict.
+        queue_url (str): Queue to create (see ``open_queue``).
+        csv_path (str): Merged output file. Defaults to ``extracted_text.csv``
+            (or ``.sqlite``/``.parquet``) next to the queue.
+        shard_size (int): Files per work item.
+        lease_seconds (float): How long a shard stays leased without a heartbeat.
+        max_attempts (int): Leases per shard before it is reported as failed.
+        resume (bool): Reuse an existing queue instead of creating one, e.g.
+            after the coordinator was restarted; finished shards are kept. If
+            the inputs were not all queued yet, the rest are queued now.
+        local_workers (int): Also start this many ``work`` processes here,
+            each with a single extraction process.
+        progress (callable): Called as ``progress(done, total)`` in shards.
+        Other arguments are as for ``extract.extract``.
+
+    Returns:
+        dict: ``csv_path``, ``files``, ``rows``, ``errors``, ``error_log`` (or
+        None), ``shards`` and ``failed_shards``.
+    """
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    if output_format is None:
+        output_format = format_for_path(csv_path) if csv_path else 'csv'
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format == 'parquet':
+        require_pyarrow()
+    if pages:
+        check_pages(pages)
+    location = queue_url.partition('://')[2] or queue_url
+    if csv_path is None:
+        csv_path = os.path.join(os.path.dirname(os.path.abspath(location)),
+                                os.path.splitext(CSV_NAME)[0] + '.' + output_format)
+    queue = open_queue(queue_url)
+    if not resume:
+        # Workers started first may have created the queue, but only a coordinator stores a config
+        if queue.config() is not None:
+            queue.close()
+            raise FileExistsError(f"Queue already exists: {location} (resume it, or delete it to start over)")
+        bbox_dict = load_bbox_dict(bbox) if isinstance(bbox, str) else bbox
+        queue.set_config({'layout': bbox_dict, 'pages': pages, 'engine': engine, 'min_overlap': min_overlap,
+                          'open_mode': open_mode, 'lease_seconds': lease_seconds, 'max_attempts': max_attempts})
+    config = queue.config()
+    layouts = LayoutSet(config['layout'])
+
+    workers = [multiprocessing.Process(target=work, args=(queue_url,), kwargs={'processes': 1})
+               for _ in range(local_workers)]
+    for process in workers:
+        process.start()
+
+    if not resume or not queue.sealed():
+        # Workers can start on the first shards while the folders are still listed.
+        # A coordinator stopped while listing is resumed by listing again.
+        known = queue.queued() if resume else set()
+        shard = []
+        for path in iter_pdf_files(inputs, recursive, include, exclude):
+            path = os.path.abspath(path)
+            if path in known:
+                continue
+            shard.append(path)
+            if len(shard) == shard_size:
+                queue.put(shard)
+                shard = []
+        if shard:
+            queue.put(shard)
+        queue.seal()
+
+    last = None
+    while True:
+        counts = queue.counts()
+        total, finished = sum(counts.values()), counts.get('done', 0) + counts.get('failed', 0)
+        if progress and (finished, total) != last:
+            progress(finished, total)
+            last = finished, total
+        if finished == total:
+            break
+        queue.reap(config['max_attempts'])
+        time.sleep(poll_interval)
+    for process in workers:
+        process.join()
+
+    summary = {'csv_path': csv_path, 'files': 0, 'rows': 0, 'shards': total,
+               'failed_shards': counts.get('failed', 0)}
+    header = output_fields(layouts, config['pages'], metadata=metadata or output_format != 'csv')
+    error_log = ErrorLog(csv_path)
+    with open_sink(output_format, csv_path, header) as writer:
+        for paths, rows, error in queue.results():
+            summary['files'] += len(paths)
+            if rows is None:
+                rows = [{'filename': os.path.basename(path), 'error': f"{error} (file: {path})"} for path in paths]
+            for row in rows:
+                if 'error' in row:
+                    error_log.write(row['error'])
+                writer.write(row)
+                summary['rows'] += 1
+    error_log.close()
+    queue.close()
+    summary['errors'] = error_log.count
+    summary['error_log'] = error_log.path if error_log.count else None
+    return summary
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Extract title-block text on several nodes through a shared queue.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coord = commands.add_parser('coordinate', help="Queue the files, wait for the workers and merge the output")
+    coord.add_argument("inputs", nargs='+', help="Folder(s) and/or PDF files to process")
+    coord.add_argument("--bbox", required=True, help="Bounding box JSON")
+    coord.add_argument("--queue", required=True, help="Queue file on a shared filesystem (or scheme://location)")
+    coord.add_argument("-o", "--output", help=f"Merged output (default: {CSV_NAME} next to the queue)")
+    coord.add_argument("--format", choices=OUTPUT_FORMATS, help="Output format (default: from the extension)")
+    coord.add_argument("--metadata", action="store_true", help="Add page_size, page_count, duration_ms and error")
+    coord.add_argument("-r", "--recursive", action="store_true", help="Search input folders recursively")
+    coord.add_argument("--include", action="append", default=[], metavar="GLOB", help="Only files matching this glob")
+    coord.add_argument("--exclude", action="append", default=[], metavar="GLOB", help="Skip matching files and folders")
+    coord.add_argument("--pages", metavar="SPEC", help="Pages to extract per file, 'all' or e.g. '1,3-5,last'")
+    coord.add_argument("--engine", choices=ENGINES, default='textbox')
+    coord.add_argument("--shard-size", type=int, default=SHARD_SIZE,
+                       help=f"Files per work item (default: {SHARD_SIZE})")
+    coord.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                       help=f"Seconds before a silent worker's shard is reassigned (default: {LEASE_SECONDS:g})")
+    coord.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS,
+                       help=f"Tries per shard before it is reported as failed (default: {MAX_ATTEMPTS})")
+    coord.add_argument("--resume", action="store_true", help="Continue with an existing queue")
+    coord.add_argument("--local-workers", type=int, default=0, help="Also run N single-process workers here")
+
+    worker = commands.add_parser('work', help="Extract shards from a queue until it is finished")
+    worker.add_argument("queue", help="Queue file created by the coordinator (or scheme://location)")
+    worker.add_argument("-j", "--processes", type=int, help="Local worker processes")
+    worker.add_argument("--worker-id", help="Name in the queue (default: hostname:pid)")
+    worker.add_argument("--timeout", type=float, default=FILE_TIMEOUT,
+                        help=f"Seconds a single file may take before it is abandoned "
+                             f"(default: {FILE_TIMEOUT:g}, 0: no limit)")
+
+    args = parser.parse_args()
+
+    if args.command == 'work':
+        done = work(args.queue, args.processes, args.worker_id, args.timeout)
+        print(f"Extracted {done['files']} file(s) in {done['shards']} shard(s)")
+        sys.exit(0)
+
+    summary = coordinate(args.inputs, args.bbox, args.queue, csv_path=args.output, shard_size=args.shard_size,
+                         lease_seconds=args.lease, max_attempts=args.max_attempts, recursive=args.recursive,
+                         include=args.include, exclude=args.exclude, pages=args.pages, engine=args.engine,
+                         output_format=args.format, metadata=args.metadata, resume=args.resume,
+                         local_workers=args.local_workers,
+                         progress=lambda done, total: print(f"{done}/{total} shards done", flush=True))
+    if summary['files'] == 0:
+        print("No PDF files found.")
+        sys.exit(1)
+    print(f"Saved {summary['rows']} row(s) from {summary['files']} file(s) to {summary['csv_path']}")
+    if summary['errors']:
+        print(f"{summary['errors']} row(s) failed. Details saved to {summary['error_log']}")
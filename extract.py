@@ -0,0 +1,1345 @@
+"""
+Headless batch extraction of title-block text from PDFs.
+
+This module holds the extraction pipeline used by ``main.py`` and can be run
+on its own on machines without a display:
+
+    python extract.py <folder or PDFs...> --bbox bounding_boxes.json
+
+It never imports tkinter or PIL, so a cron run only pays for importing fitz
+and for the extraction itself.
+"""
+import os
+import json
+import mmap
+import time
+import contextlib
+import threading
+import multiprocessing
+from collections import deque
+import fitz  # PyMuPDF
+from cache import ExtractionCache, area_keys, hash_file
+from textindex import ENGINES, area_texts, require_numpy
+from supervisor import SupervisedPool
+from discover import iter_pdf_files
+from sinks import CSVStreamWriter, OUTPUT_FORMATS, format_for_path, open_sink, require_pyarrow  # noqa: F401
+from pagesize import page_size_class
+from layouts import LayoutSet, check_pages, parse_pages
+from dedup import find_duplicates, write_duplicate_report
+from metrics import TRACE_KEY, MetricsRecorder, PROFILERS, profiled, require_pyinstrument
+from ocr import OCR_CLIPS_KEY, OCR_DPI, OCR_LANG, TESSERACT, OCRStage, has_text_layer, render_clip
+from anchor import ANCHOR_KEY, detect_anchor, page_class, project_areas, split_layout
+
+BBOX_JSON_NAME = 'bounding_boxes.json'
+CSV_NAME = 'extracted_text.csv'
+
+# Per-file columns added with metadata=True (always for SQLite and Parquet)
+METADATA_FIELDS = ['page_size', 'page_count', 'duration_ms', 'error']
+# Metadata kept in the extraction cache, so fully cached files still report it
+CACHED_METADATA = ('page_size', 'page_count')
+
+# 'file' lets MuPDF read the file through its own stream; 'mmap' maps it and
+# opens it zero-copy, so only the pages MuPDF touches are ever faulted in
+OPEN_MODES = ('file', 'mmap')
+
+
+# === PDF text extraction function for worker ===
+
+def convert_bbox(area, page_height, shrink=0):
+    """
+    Convert a bbox from PDF (origin bottom-left) to PyMuPDF (origin top-left),
+    and optionally shrink it on all sides.
+
+    Args:
+        area (tuple): (x0, y0, x1, y1) in PDF coordinates.
+        page_height (float): Page height to flip Y coordinates.
+        shrink (float): Margin to subtract from all four sides.
+
+    Returns:
+        tuple: (x0, y0, x1, y1) ready to pass to fitz.Rect(*coords)
+    """
+    x0, y0, x1, y1 = area
+
+    # Convert to PyMuPDF coordinate system
+    top =  y1
+    bottom = y0
+    left = x0
+    right = x1
+
+    # Apply shrinking
+    if shrink > 0:
+        left += shrink
+        right -= shrink
+        top -= shrink
+        bottom += shrink
+
+    return (left, bottom, right, top)
+
+
+def area_rects(bbox_dict, page_height, shrink=0):
+    """Convert every named area to a ``fitz.Rect`` for a page of the given height."""
+    return {
+        name: fitz.Rect(*convert_bbox(coords, page_height, shrink=shrink))
+        for name, coords in bbox_dict.items()
+    }
+
+
+@contextlib.contextmanager
+def open_pdf(pdf_path, open_mode='file'):
+    """Open a PDF for reading and close it (and any mapping) deterministically."""
+    if open_mode == 'file':
+        doc = fitz.open(pdf_path)
+        try:
+            yield doc
+        finally:
+            doc.close()
+        return
+
+    with open(pdf_path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    try:
+        doc = fitz.open(stream=view, filetype='pdf')
+        try:
+            yield doc
+        finally:
+            doc.close()
+    finally:
+        view.release()
+        mm.close()
+
+
+def io_bytes():
+    """
+    Bytes the calling thread has caused to be read from storage, or None where
+    it cannot be measured (Linux only).
+
+    Uses ``read_bytes`` of /proc/thread-self/io, which counts ``read()`` calls
+    and memory-map page faults alike, so both ``OPEN_MODES`` are measured the
+    same way and other threads' reads are not included. ``rchar`` is not used:
+    it counts every byte MuPDF re-reads after a seek, and never counts mmap reads.
+    """
+    try:
+        with open('/proc/thread-self/io', 'rb') as f:
+            for line in f:
+                if line.startswith(b'read_bytes:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def evict_file(path):
+    """Drop a file from the OS page cache where supported, so reading it is measured cold."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def extract_from_doc(doc, bbox_dict, rect_cache=None, engine='textbox', min_overlap=0.0, anchor=None,
+                     debug_path=None, page=None, page_no=0, ocr_dpi=None, stages=None, draw=False):
+    """
+    Extract the text of each named area on one page of an open document.
+
+    Lets callers that already opened a PDF for something else (e.g.
+    ``sortpdfs.py`` sorting by page size) extract from the same document
+    instead of reading the file twice. Arguments are as for
+    ``extract_text_from_pdf``; ``debug_path`` saves a copy with the areas
+    drawn, ``draw`` only draws them (for a caller that saves the document
+    once after several pages) and ``page`` passes page ``page_no`` if it is
+    already loaded.
+    With ``ocr_dpi``, empty areas on a page without a text layer are rendered
+    at that resolution and returned as PNGs under ``OCR_CLIPS_KEY`` for
+    ``ocr.OCRStage``. ``stages``, if given, receives the seconds spent in the
+    ``locate``, ``extract``, ``ocr_render`` and ``debug_save`` stages.
+
+    Returns:
+        dict: Area name -> text, with newlines replaced by spaces.
+    """
+    if ANCHOR_KEY in bbox_dict:
+        bbox_dict, anchor = split_layout(bbox_dict)
+    if page is None:
+        page = doc.load_page(page_no)
+    t_locate = time.perf_counter()
+    page_height = page.rect.height
+    # Anchored layouts are located once per page-size class
+    rect_key = page_height if anchor is None else page_class(page)
+    rects = rect_cache.get(rect_key) if rect_cache is not None else None
+    if rects is None:
+        areas = bbox_dict
+        if anchor is not None:
+            areas = project_areas(bbox_dict, anchor, detect_anchor(page, anchor))
+        rects = area_rects(areas, page_height)
+        if rect_cache is not None:
+            rect_cache[rect_key] = rects
+
+    # Default text page flags leave images out, so they are never decoded
+    t_extract = time.perf_counter()
+    texts = area_texts(page, rects, engine, min_overlap)
+    t_ocr = time.perf_counter()
+
+    row = {}
+    if ocr_dpi:
+        empty = [name for name, text in texts.items() if not (text and text.strip())]
+        # Rendered before any debug boxes are drawn onto the page
+        if empty and not has_text_layer(page):
+            row[OCR_CLIPS_KEY] = {name: render_clip(page, rects[name], ocr_dpi) for name in empty}
+    t_debug = time.perf_counter()
+    for name, rect in rects.items():
+        # DEBUG: draw the rectangle in red
+        if debug_path or draw:
+            page.draw_rect(rect, color=(1, 0, 0), width=1)
+
+        text = texts[name]
+        if text:
+            text = text.replace('\n', ' ').replace('\r', ' ')
+        row[name] = text
+
+    # DEBUG: save PDF with boxes if debug mode is on
+    if debug_path:
+        doc.save(debug_path)
+    if stages is not None:
+        stages.update(locate=t_extract - t_locate, extract=t_ocr - t_extract)
+        if ocr_dpi:
+            stages['ocr_render'] = t_debug - t_ocr
+        if debug_path:
+            stages['debug_save'] = time.perf_counter() - t_debug
+    return row
+
+
+def extract_text_from_pdf(args, rect_cache=None, engine='textbox', min_overlap=0.0, open_mode='file',
+                          anchor=None, page_no=0, ocr_dpi=None, stages=None, io_stats=False):
+    """
+    Extract the text of each named area on one page of a PDF (the first by default).
+
+    Args:
+        args (tuple): (pdf_path, bbox_dict, debug). ``bbox_dict`` may include
+            an ``_anchor`` entry (see ``anchor.py``).
+        rect_cache (dict): Optional page height (or anchored page class) ->
+            area rects mapping, reused across calls that share the same ``bbox_dict``.
+        engine (str): One of ``ENGINES``.
+        min_overlap (float): Word overlap fraction for the ``'numpy'`` engine.
+        open_mode (str): One of ``OPEN_MODES``.
+        anchor (dict): Title-block anchor; areas are re-projected onto each
+            page relative to where it is found.
+        page_no (int): 0-based page to extract.
+        ocr_dpi (int): Render empty areas of scanned pages for OCR at this
+            resolution (see ``extract_from_doc``).
+        stages (dict): Receives the seconds spent in each stage (``open``,
+            ``load_page`` and those of ``extract_from_doc``) for tracing.
+        io_stats (bool): Measure the bytes read from storage for this file.
+            The file is evicted from the OS page cache first, so the count
+            does not depend on what earlier runs left cached.
+
+    Returns:
+        dict: ``filename`` plus one key per area, or ``error`` on failure,
+        and the ``page_size`` (of that page), ``page_count`` and ``duration_ms`` metadata.
+        With ``io_stats``, ``bytes_read`` is added where ``io_bytes`` can measure it.
+    """
+    pdf_path, bbox_dict, debug = args
+    row = {'filename': os.path.basename(pdf_path)}
+    bytes_before = None
+    if io_stats:
+        evict_file(pdf_path)
+        bytes_before = io_bytes()
+    start = time.perf_counter()
+    try:
+        with open_pdf(pdf_path, open_mode) as doc:
+            t_load = time.perf_counter()
+            page = doc.load_page(page_no)
+            if stages is not None:
+                stages['open'] = t_load - start
+                stages['load_page'] = time.perf_counter() - t_load
+            row['page_size'] = page_size_class(page.rect.width, page.rect.height)
+            row['page_count'] = doc.page_count
+            suffix = f"_p{page_no + 1}_debug.pdf" if page_no else "_debug.pdf"
+            debug_path = os.path.splitext(pdf_path)[0] + suffix if debug else None
+            row.update(extract_from_doc(doc, bbox_dict, rect_cache, engine, min_overlap, anchor,
+                                        debug_path, page, ocr_dpi=ocr_dpi, stages=stages))
+    except Exception as e:
+        row['error'] = f"{e} (file: {pdf_path})"
+    row['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    if bytes_before is not None:
+        row['bytes_read'] = io_bytes() - bytes_before
+    return row
+
+
+# === Batch pipeline ===
+
+def load_bbox_dict(json_path):
+    """Load the named areas saved by the area editor."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collect_pdf_files(inputs, recursive=False, include=(), exclude=()):
+    """
+    Expand folders and file paths into a list of PDF files.
+
+    Args:
+        inputs (str | list): A folder, a PDF path, or a list of either.
+        recursive (bool): Search subfolders too.
+        include (list): Globs a discovered file must match.
+        exclude (list): Globs for files and folders to skip.
+
+    Returns:
+        list: Paths of the PDFs to process, each folder in name order.
+        ``extract`` streams the same paths from ``iter_pdf_files`` in
+        directory order instead of waiting for the full list.
+    """
+    return list(iter_pdf_files(inputs, recursive, include, exclude, sort=True))
+
+
+class ErrorLog:
+    """Append failed rows to ``<csv>_errors.log``; the file is only created on the first error."""
+
+    def __init__(self, csv_path):
+        self.path = os.path.splitext(csv_path)[0] + "_errors.log"
+        self.count = 0
+        self.file = None
+
+    def write(self, message):
+        if self.file is None:
+            self.file = open(self.path, 'w', encoding='utf-8')
+        self.file.write(message + '\n')
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class ReorderWindow:
+    """
+    Restore input order for ``imap_unordered`` results with bounded memory.
+
+    ``feed`` blocks the pool's task feeder once ``size`` tasks are either in
+    flight or finished but waiting for an earlier index, so at most ``size``
+    results are ever held back.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.pending = {}
+        self.next_index = 0
+        self._slots = threading.Semaphore(size)
+        self._closed = False
+
+    def feed(self, tasks):
+        for idx, task in enumerate(tasks):
+            while not self._slots.acquire(timeout=0.5):
+                if self._closed:
+                    return
+            if self._closed:
+                return
+            yield idx, task
+
+    def push(self, idx, result):
+        """Store a finished result and return the results that are now in order."""
+        self.pending[idx] = result
+        ready = []
+        while self.next_index in self.pending:
+            ready.append(self.pending.pop(self.next_index))
+            self.next_index += 1
+            self._slots.release()
+        return ready
+
+    def close(self):
+        # Unblock the feeder so the pool can shut down after an early exit
+        self._closed = True
+        self._slots.release()
+
+
+class ExtractionControl:
+    """
+    Pause, resume or cancel a running ``extract`` from another thread.
+
+    While paused no new files are handed to the workers; files already sent
+    still finish. Cancelling stops the run after the current result, kills
+    the workers and returns the summary with ``cancelled`` set. ``errors``
+    counts failed files so far and may be read from any thread.
+    """
+
+    def __init__(self):
+        self.errors = 0
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+        self._closed = False
+        self._slots = None
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()
+
+    def feed(self, tasks, in_flight):
+        """
+        Pass tasks through while running, with at most ``in_flight`` unfinished.
+
+        Pool feeders read ahead of the workers, so without the bound a pause
+        would only take effect once every file had already been queued.
+        """
+        self._slots = threading.Semaphore(in_flight)
+        for task in tasks:
+            while True:
+                if self._closed or self.cancelled:
+                    return
+                if self._running.wait(0.2) and self._slots.acquire(timeout=0.2):
+                    break
+            yield task
+
+    def task_done(self):
+        self._slots.release()
+
+    def close(self):
+        # Unblock the feeder so the pool can shut down, as ReorderWindow.close
+        self._closed = True
+
+
+class PageScheduler:
+    """
+    Pool feeder that sends the remaining pages of planned files out as tasks of their own.
+
+    A planned file's first task returns tasks for its other pages, which
+    ``add`` queues ahead of new files, so one large drawing set is spread
+    over the pool instead of pinning a single worker. Files are read on a
+    thread of their own, at most ``lookahead`` ahead, so a blocked file feed
+    (a full reorder window, a pause) never holds back the pages of files
+    already planned. Iteration ends once the files are exhausted and every
+    file task has reported back through ``add``.
+
+    Args:
+        indexed_tasks (iterable): ``(idx, task)`` of the files.
+        lookahead (int): Files read ahead of the pool.
+        batch (int): Yield lists of up to this many tasks, as many as are
+            ready, instead of single tasks. Batches never wait to fill up,
+            since the tasks that would fill them may depend on the batch.
+    """
+
+    def __init__(self, indexed_tasks, lookahead, batch=None):
+        self.lookahead = lookahead
+        self.batch = batch
+        self._cond = threading.Condition()
+        self._files = deque()
+        self._pages = deque()
+        self._planning = 0  # File tasks handed out that have not reported back
+        self._listed = False
+        self._closed = False
+        self._error = None
+        self._reader = threading.Thread(target=self._read, args=(indexed_tasks,), daemon=True)
+        self._reader.start()
+
+    def _read(self, indexed_tasks):
+        try:
+            for indexed_task in indexed_tasks:
+                with self._cond:
+                    while len(self._files) >= self.lookahead and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    self._files.append(indexed_task)
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._listed = True
+                self._cond.notify_all()
+
+    def add(self, idx, tasks):
+        """Report a file task as done and queue the tasks for its other pages."""
+        with self._cond:
+            self._planning -= 1
+            self._pages.extend((idx, task) for task in tasks)
+            self._cond.notify_all()
+
+    def _take(self):
+        if self._pages:
+            return self._pages.popleft()
+        self._planning += 1
+        indexed_task = self._files.popleft()
+        self._cond.notify_all()
+        return indexed_task
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                while not (self._pages or self._files or self._closed
+                           or (self._listed and not self._planning)):
+                    self._cond.wait()
+                if self._error is not None:
+                    raise self._error
+                if self._closed or not (self._pages or self._files):
+                    return
+                if self.batch is None:
+                    item = self._take()
+                else:
+                    item = []
+                    while (self._pages or self._files) and len(item) < self.batch:
+                        item.append(self._take())
+            yield item
+
+    def close(self):
+        # Unblock the reader and the pool's feeder so the pool can shut down
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+# Per-worker state set once by the pool initializer instead of pickled per task
+_worker = {}
+
+MAX_CHUNKSIZE = 64
+# Used while files are still being discovered and the total is unknown
+STREAM_CHUNKSIZE = 8
+# Pages a planned file extracts itself; the rest go out as tasks of this many pages
+PAGES_PER_TASK = 8
+
+
+def _init_worker(layouts, debug, options, instrument=None, keys=None):
+    """
+    ``options`` holds the extraction settings (``engine``, ``min_overlap``,
+    ``open_mode``, ``ocr_dpi``, ``io_stats`` and the ``pages`` selection);
+    ``instrument`` enables tracing (``trace``) and sampled profiling
+    (``profile_every``, ``profile_dir``, ``profiler``), see ``metrics.py``;
+    ``keys`` is the run's ``CacheKeys``, needed when tasks carry cached text.
+    """
+    _worker['layouts'] = layouts
+    _worker['debug'] = debug
+    _worker['options'] = options
+    _worker['instrument'] = instrument or {}
+    _worker['keys'] = keys
+    _worker['rects'] = {}  # Layout name -> rect cache
+
+
+def _plan_pages(doc, page_nos, stages=None):
+    """
+    Match each page to a layout.
+
+    Returns:
+        tuple: (targets, failed) where ``targets`` lists ``(page_no,
+        layout_name)`` for the pages with a layout and ``failed`` lists
+        ``(page_no, error)`` for pages that could not be loaded.
+    """
+    layouts = _worker['layouts']
+    targets, failed = [], []
+    t_load = time.perf_counter()
+    for page_no in page_nos:
+        try:
+            page = doc.load_page(page_no)
+        except Exception as e:
+            failed.append((page_no, e))
+            continue
+        layout_name = layouts.select(page_size_class(page.rect.width, page.rect.height))
+        if layout_name is not None:
+            targets.append((page_no, layout_name))
+    if stages is not None:
+        stages['load_page'] = stages.get('load_page', 0.0) + time.perf_counter() - t_load
+    return targets, failed
+
+
+def _extract_file(pdf_path, targets, cached, stages=None):
+    """
+    Extract the target pages of one file from a single open document.
+
+    With ``targets`` None the file is planned while it is open anyway: the
+    run's page selection is applied and each page is matched to a layout.
+    Beyond ``PAGES_PER_TASK`` pages only the first ones are extracted here
+    and the rest are returned, so the caller can spread them over the pool;
+    debug runs extract every page here for a single debug copy. Areas found
+    in ``cached`` are not extracted again, and a file whose targets are all
+    cached is not opened at all.
+
+    Returns:
+        tuple: (rows, extracted, cached_count, rest) where ``extracted`` maps
+        each page number to the names extracted for the cache, or is None if
+        the file could not be opened, ``cached_count`` counts the areas (not
+        the cached page metadata) taken from ``cached`` and ``rest`` lists the
+        planned ``(page_no, layout_name)`` targets left for other tasks.
+    """
+    layouts, debug, options = _worker['layouts'], _worker['debug'], _worker['options']
+    filename = os.path.basename(pdf_path)
+    rows, extracted, cached_count, rest = [], {}, 0, []
+
+    def cached_areas(layout_name, page_no):
+        if not cached:
+            return {}
+        keys = _worker['keys'](layout_name, page_no)
+        return {name: cached[key] for name, key in keys.items() if key in cached}
+
+    if targets is not None:
+        found = [cached_areas(layout_name, page_no) for page_no, layout_name in targets]
+        if all(name in texts for (_, layout_name), texts in zip(targets, found)
+               for name in layouts.areas(layout_name)[0]):
+            for (page_no, layout_name), texts in zip(targets, found):
+                rows.append(dict(texts, filename=filename, page=page_no + 1, layout=layout_name))
+                extracted[page_no] = []
+                cached_count += sum(name not in CACHED_METADATA for name in texts)
+            return rows, extracted, cached_count, rest
+
+    start = last = time.perf_counter()
+    bytes_before = None
+    if options.get('io_stats'):
+        evict_file(pdf_path)
+        bytes_before = io_bytes()
+    try:
+        with open_pdf(pdf_path, options['open_mode']) as doc:
+            if stages is not None:
+                stages['open'] = time.perf_counter() - start
+            if targets is None:
+                pages = options.get('pages')
+                page_nos = parse_pages(pages, doc.page_count) if pages else [0]
+                if debug or len(page_nos) <= PAGES_PER_TASK:
+                    targets = [(page_no, None) for page_no in page_nos]  # Matched below
+                else:
+                    targets, failed = _plan_pages(doc, page_nos, stages)
+                    targets, rest = targets[:PAGES_PER_TASK], targets[PAGES_PER_TASK:]
+                    rows += [{'filename': filename, 'page': page_no + 1, 'layout': '',
+                              'error': f"{e} (file: {pdf_path})"} for page_no, e in failed]
+
+            for page_no, layout_name in targets:
+                # The layout is unknown ('') until an unplanned page is loaded
+                row = {'filename': filename, 'page': page_no + 1, 'layout': layout_name or ''}
+                try:
+                    t_load = time.perf_counter()
+                    page = doc.load_page(page_no)
+                    if stages is not None:
+                        stages['load_page'] = stages.get('load_page', 0.0) + time.perf_counter() - t_load
+                    page_size = page_size_class(page.rect.width, page.rect.height)
+                    if layout_name is None:
+                        layout_name = layouts.select(page_size)
+                        if layout_name is None:
+                            continue  # No layout for this page class
+                    row['layout'] = layout_name
+                    texts = cached_areas(layout_name, page_no)
+                    cached_count += sum(name not in CACHED_METADATA for name in texts)
+                    row.update(texts, page_size=page_size, page_count=doc.page_count)
+                    areas, anchor = layouts.areas(layout_name)
+                    names = [name for name in areas if name not in texts]
+                    if names:
+                        if len(names) == len(areas):
+                            subset, rects = areas, _worker['rects'].setdefault(layout_name, {})
+                        else:
+                            subset, rects = {name: areas[name] for name in names}, None
+                        page_stages = {} if stages is not None else None
+                        row.update(extract_from_doc(doc, subset, rects, options['engine'], options['min_overlap'],
+                                                    anchor, page=page, page_no=page_no,
+                                                    ocr_dpi=options.get('ocr_dpi'), stages=page_stages,
+                                                    draw=debug))
+                        for stage, seconds in (page_stages or {}).items():
+                            stages[stage] = stages.get(stage, 0.0) + seconds
+                    extracted[page_no] = names + [name for name in CACHED_METADATA if name in row]
+                except Exception as e:
+                    row['error'] = f"{e} (file: {pdf_path})"
+                now = time.perf_counter()
+                row['duration_ms'] = round((now - last) * 1000, 3)  # The first row includes the open
+                last = now
+                rows.append(row)
+
+            if debug and extracted:
+                t_save = time.perf_counter()
+                try:
+                    doc.save(os.path.splitext(pdf_path)[0] + "_debug.pdf")
+                except Exception as e:
+                    rows[0]['error'] = f"Debug copy failed: {e} (file: {pdf_path})"
+                if stages is not None:
+                    stages['debug_save'] = time.perf_counter() - t_save
+    except Exception as e:
+        # Only opening the file fails here; page errors are kept per row
+        rows = [{'filename': filename, 'page': 1, 'layout': targets[0][1] if targets else '',
+                 'error': f"{e} (file: {pdf_path})",
+                 'duration_ms': round((time.perf_counter() - start) * 1000, 3)}]
+        extracted, rest = None, []
+
+    rows.sort(key=lambda row: row['page'])  # Pages that failed to plan come first
+    if bytes_before is not None and rows:
+        rows[0]['bytes_read'] = io_bytes() - bytes_before
+    return rows, extracted, cached_count, rest
+
+
+def _extract_indexed(indexed_task):
+    """
+    Worker wrapper: extract a file's pages and return ``(idx, rows, fingerprint, rest)``.
+
+    ``rows`` holds one row per extracted page, in page order, and may be
+    empty when no page matches a layout. The fingerprint gets its content
+    hash and the names to cache per page (``extracted``) filled in here, so
+    new files are only read by the workers. ``rest`` holds the tasks for the
+    pages of a planned file that are left to other workers; their results
+    carry the same ``idx``. With tracing on the first row carries the task's
+    stage timings under ``TRACE_KEY``.
+    """
+    idx, (pdf_path, targets, cached, fingerprint) = indexed_task
+    instrument = _worker['instrument']
+    stages = {} if instrument.get('trace') else None
+    started = time.time()
+
+    every = instrument.get('profile_every')
+    if every and idx % every == 0:
+        name = f"{os.path.splitext(os.path.basename(pdf_path))[0]}_{idx}"
+        if targets is not None and targets[0][0]:
+            name += f"_p{targets[0][0] + 1}"
+        with profiled(os.path.join(instrument['profile_dir'], name), instrument.get('profiler', 'cprofile')):
+            rows, extracted, cached_count, rest = _extract_file(pdf_path, targets, cached, stages)
+    else:
+        rows, extracted, cached_count, rest = _extract_file(pdf_path, targets, cached, stages)
+
+    if fingerprint is not None and extracted is not None:
+        if fingerprint['content_hash'] is None:
+            fingerprint['content_hash'] = hash_file(pdf_path)
+        fingerprint['extracted'] = extracted
+    if stages is not None and rows:
+        rows[0][TRACE_KEY] = {'path': pdf_path, 'worker': os.getpid(), 'started': started, 'stages': stages,
+                              'areas': sum(name not in CACHED_METADATA for names in (extracted or {}).values()
+                                           for name in names),
+                              'cached_areas': cached_count}
+
+    tasks = []
+    for start in range(0, len(rest), PAGES_PER_TASK):
+        chunk = rest[start:start + PAGES_PER_TASK]
+        chunk_cached = {}
+        if cached:
+            chunk_cached = {key: cached[key] for page_no, layout_name in chunk
+                            for key in _worker['keys'](layout_name, page_no).values() if key in cached}
+        chunk_fingerprint = None
+        if fingerprint is not None:
+            chunk_fingerprint = {k: v for k, v in fingerprint.items() if k != 'extracted'}
+        tasks.append((pdf_path, chunk, chunk_cached, chunk_fingerprint))
+    return idx, rows, fingerprint, tasks
+
+
+def _failed_result(indexed_task, reason):
+    """Error rows for a task the supervised pool had to abandon."""
+    idx, (pdf_path, targets, cached, fingerprint) = indexed_task
+    rows = [{'filename': os.path.basename(pdf_path), 'page': page_no + 1, 'layout': layout_name,
+             'error': f"{reason} (file: {pdf_path})"} for page_no, layout_name in targets or [(0, '')]]
+    return idx, rows, None, []
+
+
+def _extract_batch(batch):
+    return [_extract_indexed(indexed_task) for indexed_task in batch]
+
+
+def _batches(indexed_tasks, size):
+    batch = []
+    for indexed_task in indexed_tasks:
+        batch.append(indexed_task)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _polled(pool, tasks, poll_interval=0.2):
+    """
+    Like ``pool.imap_unordered`` but yields None whenever no result came within ``poll_interval``.
+
+    The ticks let the caller notice a cancel between slow files and hand on
+    files whose OCR finished while no extraction result arrives. ``tasks``
+    are single indexed tasks for a ``SupervisedPool`` and batches of them
+    for a ``Pool``, which only offers ``next(timeout)`` on its iterator when
+    ``chunksize`` is 1.
+    """
+    if isinstance(pool, SupervisedPool):
+        yield from pool.imap_unordered(_extract_indexed, tasks, idle=True)
+        return
+    results = pool.imap_unordered(_extract_batch, tasks)
+    while True:
+        try:
+            batch = results.next(timeout=poll_interval)
+        except multiprocessing.TimeoutError:
+            yield None
+            continue
+        except StopIteration:
+            return
+        yield from batch
+
+
+def _merge_trace(trace, other):
+    """Add the stage timings and area counts of another task of the same file."""
+    if trace is None:
+        return other
+    if other is not None:
+        for stage, seconds in other['stages'].items():
+            trace['stages'][stage] = trace['stages'].get(stage, 0.0) + seconds
+        trace['areas'] += other['areas']
+        trace['cached_areas'] += other['cached_areas']
+    return trace
+
+
+def _cache_variant(engine, min_overlap, anchor=None, ocr=None):
+    """Cache key variant: engines with identical output share cache entries."""
+    if engine in ('textbox', 'index'):
+        variant = ''
+    elif engine == 'numpy' and min_overlap > 0:
+        variant = f'words:{min_overlap}'
+    else:
+        variant = 'words'
+    if anchor is not None:
+        variant += json.dumps(anchor, sort_keys=True)
+    if ocr is not None:
+        variant += f':ocr:{ocr}'
+    return variant
+
+
+class CacheKeys:
+    """
+    Cache keys of each layout's areas and metadata per page, memoized.
+
+    Built once per run and handed to the workers, which pick a file's
+    cached text by these keys once they know its pages.
+    """
+
+    def __init__(self, layouts, engine='textbox', min_overlap=0.0, ocr=None):
+        self.layouts = layouts
+        self.engine = engine
+        self.min_overlap = min_overlap
+        self.ocr = ocr
+        self._keys = {}
+
+    def __call__(self, layout_name, page_no):
+        if (layout_name, page_no) not in self._keys:
+            areas, anchor = self.layouts.areas(layout_name)
+            # The first page of a plain layout keeps the keys of single-page runs
+            suffix = f":{layout_name}:{page_no}" if layout_name or page_no else ''
+            variant = _cache_variant(self.engine, self.min_overlap, anchor, self.ocr)
+            keys = area_keys(areas, variant=variant + suffix)
+            prefix = f"meta:{page_no}:" if page_no else 'meta:'
+            keys.update({name: prefix + name for name in CACHED_METADATA})
+            self._keys[layout_name, page_no] = keys
+        return self._keys[layout_name, page_no]
+
+
+def _prepare_jobs(pdf_files, layouts, debug, cache, pages=None):
+    """
+    Yield one ``(pdf_path, targets, cached, fingerprint)`` task per file.
+
+    ``targets`` is ``[(0, '')]`` for the first page of a plain layout, or
+    None when a page selection or per-class layouts need the file's pages
+    counted and classified; the worker does that while it has the file open,
+    so this feeder never opens a PDF. ``cached`` maps cache keys to the
+    file's text from earlier runs.
+    """
+    plan = bool(pages or layouts.multi)
+    for pdf_path in pdf_files:
+        cached, fingerprint = {}, None
+        if cache:
+            try:
+                fingerprint, cached = cache.lookup(pdf_path)
+            except OSError:
+                pass  # Let the worker report the unreadable file
+            if debug:
+                cached = {}  # Debug output needs every area drawn
+        yield pdf_path, None if plan else [(0, '')], cached, fingerprint
+
+
+def output_fields(layouts, pages=None, io_stats=False, metadata=False):
+    """Columns of the output for a ``LayoutSet`` and the given options."""
+    fields = (['filename'] + (['page'] if pages else []) + (['layout'] if layouts.multi else [])
+              + layouts.fieldnames + (['bytes_read'] if io_stats else []))
+    return fields + METADATA_FIELDS if metadata else fields
+
+
+def adaptive_chunksize(n_tasks, processes, window=None):
+    """
+    Pick an ``imap`` chunksize that amortises IPC without starving workers.
+
+    Follows ``Pool.map``'s heuristic of about four chunks per worker, capped so
+    results still stream regularly and, for ordered output, so a chunk can
+    never need more tasks than the reorder window lets through.
+    """
+    chunksize, extra = divmod(n_tasks, processes * 4)
+    if extra:
+        chunksize += 1
+    chunksize = min(chunksize, MAX_CHUNKSIZE)
+    if window:
+        chunksize = min(chunksize, window // (2 * processes))
+    return max(1, chunksize)
+
+
+def extract(inputs, bbox, csv_path=None, debug=False, processes=None, progress=None,
+            ordered=False, window=1000, flush_every=100, fsync_interval=5.0, cache=False,
+            chunksize=None, engine='textbox', min_overlap=0.0, open_mode='file', io_stats=False,
+            timeout=None, max_rss_mb=None, maxtasksperchild=None, recursive=False,
+            include=(), exclude=(), output_format=None, metadata=False, control=None, pages=None,
+            ocr=False, ocr_dpi=OCR_DPI, ocr_lang=OCR_LANG, ocr_workers=1, dedup=False,
+            metrics=None, profile_every=None, profile_dir=None, profiler='cprofile'):
+    """
+    Extract the named areas from every PDF and stream them to a CSV file
+    (or a SQLite database or Parquet file, see ``sinks.py``).
+
+    By default one row is written per file, from its first page. With
+    ``pages`` or a bbox JSON holding per-page-class layouts (see
+    ``layouts.py``) one row is written per extracted page, with ``page`` and
+    ``layout`` columns.
+
+    Args:
+        inputs (str | list): A folder, a PDF path, or a list of either. Folders
+            are listed while extraction runs, so work starts on the first files
+            before a large tree has been walked. Files are taken in directory
+            order, which is not necessarily name order.
+        bbox (str | dict): Path to ``bounding_boxes.json`` or the loaded dict,
+            optionally with an ``_anchor`` entry or per-page-class ``_layouts``.
+        csv_path (str): Output file. Defaults to ``extracted_text.csv`` (or
+            ``.sqlite``/``.parquet``) next to the bbox JSON, or in the first input folder.
+        debug (bool): Save a ``_debug.pdf`` copy of each file with the areas drawn.
+        processes (int): Worker count. Defaults to ``multiprocessing.cpu_count()``.
+        progress (callable): Called as ``progress(done, total)`` after each file;
+            ``total`` counts the files queued so far while folders are being listed.
+        ordered (bool): Write rows in input order instead of completion order.
+        window (int): Maximum files held back while waiting for an earlier file
+            when ``ordered`` is set.
+        flush_every (int): Flush the CSV after this many rows.
+        fsync_interval (float): Minimum seconds between fsyncs of the CSV.
+        cache (bool | str): Reuse text from previous runs for unchanged files.
+            ``True`` keeps the cache in ``<csv>_cache.sqlite``; a string is
+            used as the cache path. Off by default.
+        chunksize (int): Tasks sent to a worker at once. Defaults to
+            ``adaptive_chunksize``, or ``STREAM_CHUNKSIZE`` when folders are
+            streamed and the total is not known up front.
+        engine (str): Text lookup per area, one of ``ENGINES``. ``'index'``
+            gives the same output as ``'textbox'`` from a single text page.
+        min_overlap (float): For the ``'numpy'`` engine, the fraction of a
+            word's bbox that must lie inside an area for it to be included.
+        open_mode (str): How workers open each PDF, one of ``OPEN_MODES``.
+        io_stats (bool): Add a ``bytes_read`` column with the bytes read from
+            storage per file, measured cold (see ``io_bytes``).
+        timeout (float): Seconds a single file may take before its worker is
+            killed and the file is logged as failed.
+        max_rss_mb (float): Resident memory ceiling per worker in MB (Linux).
+        maxtasksperchild (int): Replace each worker after this many files.
+            Setting any of these three runs the files in a ``SupervisedPool``.
+        recursive (bool): Search input folders recursively.
+        include (list): Globs a discovered file must match (see ``discover.py``).
+        exclude (list): Globs for files and folders to skip.
+        output_format (str): One of ``OUTPUT_FORMATS``. Defaults to the format
+            matching the extension of ``csv_path``, or CSV.
+        metadata (bool): Add the ``METADATA_FIELDS`` columns (page size class,
+            page count, duration and error). Always on for SQLite and Parquet.
+        control (ExtractionControl): Lets another thread pause, resume or
+            cancel the run.
+        pages (str): Pages to extract from each file, ``'all'`` or e.g.
+            ``'1,3-5,last'`` (see ``layouts.parse_pages``). Defaults to the
+            first page.
+        ocr (bool): OCR areas that come back empty on pages without a text
+            layer, using Tesseract (see ``ocr.py``).
+        ocr_dpi (int): Resolution the clips are rendered at for OCR.
+        ocr_lang (str): Tesseract language(s), e.g. ``'eng+deu'``.
+        ocr_workers (int): Concurrent Tesseract processes, separate from ``processes``.
+        dedup (bool): Extract byte-identical files once and repeat their rows
+            for every copy. All inputs are listed and grouped before
+            extraction starts; the groups are written to ``<csv>_duplicates.csv``.
+        metrics (str): Write per-file stage timings, worker id, queue wait and
+            (with ``io_stats``) bytes read to this ``.jsonl`` or ``.prom`` file
+            (see ``metrics.py``).
+        profile_every (int): Profile every Nth file in its worker.
+        profile_dir (str): Folder for the profiles. Defaults to ``<csv>_profiles``.
+        profiler (str): One of ``PROFILERS``.
+
+    Returns:
+        dict: ``csv_path``, ``files`` (files queued), ``rows`` (rows written),
+        ``errors``, ``error_log`` (or None), ``bytes_read`` (None where it
+        cannot be measured), ``cancelled``, ``duplicates`` (copies not
+        extracted) and ``duplicate_report`` (or None).
+    """
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    streamed = any(os.path.isdir(path) for path in inputs)
+    queued = {'files': 0, 'tasks': 0}
+
+    def count(items, what):
+        for item in items:
+            queued[what] += 1
+            yield item
+
+    # A full listing is needed for dedup anyway, so it gets name order
+    pdf_files = count(iter_pdf_files(inputs, recursive, include, exclude, sort=dedup), 'files')
+
+    if isinstance(bbox, str):
+        bbox_path = bbox
+        bbox_dict = load_bbox_dict(bbox)
+    else:
+        bbox_path = None
+        bbox_dict = bbox
+
+    if output_format is None:
+        output_format = format_for_path(csv_path) if csv_path else 'csv'
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format == 'parquet':
+        require_pyarrow()
+
+    if csv_path is None:
+        if bbox_path:
+            out_dir = os.path.dirname(os.path.abspath(bbox_path))
+        else:
+            first = inputs[0]
+            out_dir = first if os.path.isdir(first) else os.path.dirname(os.path.abspath(first))
+        csv_path = os.path.join(out_dir, os.path.splitext(CSV_NAME)[0] + '.' + output_format)
+
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    if open_mode not in OPEN_MODES:
+        raise ValueError(f"Unknown open mode: {open_mode}")
+    if engine == 'numpy':
+        require_numpy()
+    if pages:
+        check_pages(pages)
+    if ocr and TESSERACT is None:
+        raise RuntimeError("OCR requires Tesseract on the PATH (https://github.com/tesseract-ocr/tesseract)")
+
+    instrument = {'trace': bool(metrics)}
+    if profile_every:
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler}")
+        if profiler == 'pyinstrument':
+            require_pyinstrument()
+        profile_dir = profile_dir or os.path.splitext(csv_path)[0] + '_profiles'
+        os.makedirs(profile_dir, exist_ok=True)
+        instrument.update(profile_every=profile_every, profile_dir=profile_dir, profiler=profiler)
+
+    # Opened only once the arguments are known to be valid, so a bad one leaves no cache file behind
+    cache_db = None
+    if cache:
+        cache_path = cache if isinstance(cache, str) else os.path.splitext(csv_path)[0] + '_cache.sqlite'
+        cache_db = ExtractionCache(cache_path)
+
+    duplicates, duplicate_report, fan_out = {}, None, {}
+    if dedup:
+        # Grouping needs every size up front, so the listing is not streamed
+        pdf_files, duplicates, sizes = find_duplicates(pdf_files)
+        streamed = False
+        if duplicates:
+            duplicate_report = os.path.splitext(csv_path)[0] + '_duplicates.csv'
+            write_duplicate_report(duplicate_report, duplicates, sizes)
+
+    def note_copies(tasks):
+        """Remember which task indices belong to files with duplicates."""
+        for idx, task in enumerate(tasks):
+            if task[0] in duplicates:
+                fan_out[idx] = duplicates[task[0]]
+            yield task
+
+    layouts = LayoutSet(bbox_dict)
+    keys_for = CacheKeys(layouts, engine, min_overlap, f"{ocr_lang}@{ocr_dpi}" if ocr else None)
+
+    # Generator: the pool's feeder pulls paths (and cache lookups) as it goes
+    tasks = count(_prepare_jobs(pdf_files, layouts, debug, cache_db, pages), 'tasks')
+    if duplicates:
+        tasks = note_copies(tasks)
+    header = output_fields(layouts, pages, io_stats, metadata or output_format != 'csv')
+    options = {'engine': engine, 'min_overlap': min_overlap, 'open_mode': open_mode,
+               'ocr_dpi': ocr_dpi if ocr else None, 'io_stats': io_stats, 'pages': pages}
+    bytes_read = None
+    reorder = ReorderWindow(window) if ordered else None
+    indexed_tasks = reorder.feed(tasks) if reorder else enumerate(tasks)
+    error_log = ErrorLog(csv_path)
+    ocr_stage = OCRStage(ocr_workers, ocr_dpi, ocr_lang, cache_db) if ocr else None
+    recorder = MetricsRecorder(metrics) if metrics else None
+    dispatched = {}  # Task index -> wall time it was handed to the pool
+    done = written = 0
+
+    processes = processes or multiprocessing.cpu_count()
+    if chunksize is None and streamed:
+        # The total is unknown while folders are listed; small batches start work at once
+        chunksize = STREAM_CHUNKSIZE
+        if ordered:
+            chunksize = max(1, min(chunksize, window // (2 * processes)))
+    elif chunksize is None:
+        n_files = len(pdf_files) if dedup else len(inputs)
+        chunksize = adaptive_chunksize(n_files, processes, window if ordered else None)
+    elif ordered:
+        chunksize = min(chunksize, window)  # A larger chunk could never be fed
+
+    if control is not None:
+        # Small chunks so a pause takes effect within a few files
+        chunksize = min(chunksize, STREAM_CHUNKSIZE)
+        indexed_tasks = control.feed(indexed_tasks, processes * chunksize * 2)
+
+    def stamp(indexed_tasks):
+        """Record when the pool's feeder takes each task, for the queue wait."""
+        for idx, task in indexed_tasks:
+            dispatched[idx] = time.time()
+            yield idx, task
+
+    if recorder is not None:
+        indexed_tasks = stamp(indexed_tasks)
+
+    if timeout or max_rss_mb or maxtasksperchild:
+        pool = SupervisedPool(processes, _init_worker, (layouts, debug, options, instrument, keys_for),
+                              timeout=timeout, max_rss=int(max_rss_mb * 2**20) if max_rss_mb else None,
+                              maxtasksperchild=maxtasksperchild, on_failure=_failed_result)
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker, (layouts, debug, options, instrument, keys_for))
+
+    scheduler = None
+    if pages or layouts.multi:
+        # Planned files hand their remaining pages back as tasks of their own
+        scheduler = PageScheduler(indexed_tasks, processes * chunksize * 2,
+                                  None if isinstance(pool, SupervisedPool) else chunksize)
+    parts = {}  # File index -> [rows, fingerprint, trace, tasks left] of files split over several tasks
+
+    def collect(idx, rows, fingerprint, tasks):
+        """Return ``(idx, rows, fingerprint)`` once all of a file's tasks are done, else None."""
+        if idx not in parts:
+            if scheduler is not None:
+                scheduler.add(idx, tasks)
+            if not tasks:
+                return idx, rows, fingerprint
+            parts[idx] = [rows, fingerprint, rows[0].pop(TRACE_KEY, None) if rows else None, len(tasks)]
+            return None
+        part = parts[idx]
+        part[0] += rows
+        if fingerprint is not None and 'extracted' in fingerprint and part[1] is not None:
+            part[1].setdefault('extracted', {}).update(fingerprint['extracted'])
+        part[2] = _merge_trace(part[2], rows[0].pop(TRACE_KEY, None) if rows else None)
+        part[3] -= 1
+        if part[3]:
+            return None
+        rows, fingerprint, trace, _ = parts.pop(idx)
+        rows.sort(key=lambda row: row['page'])
+        if trace is not None and rows:
+            rows[0][TRACE_KEY] = trace
+        return idx, rows, fingerprint
+
+    with open_sink(output_format, csv_path, header, flush_every, fsync_interval) as writer, pool:
+
+        def finish(idx, rows, fingerprint):
+            """Cache and write one finished file's rows."""
+            nonlocal done, written, bytes_read
+            done += 1
+            trace = rows[0].pop(TRACE_KEY, None) if rows else None
+            queued_at = dispatched.pop(idx, None)
+            for row in rows:
+                if 'bytes_read' in row:
+                    bytes_read = (bytes_read or 0) + row['bytes_read']
+            if cache_db and fingerprint is not None and 'extracted' in fingerprint:
+                texts, keep = {}, set()
+                for row in rows:
+                    if row['layout'] not in layouts:
+                        continue  # The page failed before its layout was known
+                    keys = keys_for(row['layout'], row['page'] - 1)
+                    keep.update(keys.values())
+                    if 'error' not in row:
+                        texts.update((keys[name], row.get(name))
+                                     for name in fingerprint['extracted'].get(row['page'] - 1, ()))
+                cache_db.store(fingerprint, texts, keep)
+                if done % flush_every == 0:
+                    cache_db.commit()
+            out_rows = list(rows)
+            if idx in fan_out:
+                # Each copy's pages follow all of the original's, also in ordered
+                # output, so every file's rows stay together
+                for path in fan_out.pop(idx):
+                    out_rows += [dict(row, filename=os.path.basename(path)) for row in rows]
+            t_write = time.perf_counter()
+            ready = reorder.push(idx, out_rows) if reorder else [out_rows]
+            for out_rows in ready:
+                for out in out_rows or ():
+                    if 'error' in out:
+                        error_log.write(out['error'])
+                    writer.write(out)
+                    written += 1
+            if recorder is not None:
+                queue_wait = trace['started'] - queued_at if trace and queued_at else None
+                write_time = time.perf_counter() - t_write
+                for i, row in enumerate(rows):
+                    # The file's trace, queue wait and write time go with its first row
+                    recorder.record(row, *((trace, queue_wait, write_time) if i == 0 else (None,)))
+            if control is not None:
+                control.errors += any('error' in row for row in rows)
+            if progress:
+                progress(done, queued['tasks'])
+
+        try:
+            if scheduler is not None:
+                # Batches are cut by the scheduler, so the pool's own chunking stays at 1
+                results = _polled(pool, scheduler)
+            elif control is not None or ocr_stage is not None:
+                # Wake up without results too: to notice a cancel, and because
+                # files held for OCR keep their --ordered window slots, so the
+                # feeder may be waiting for them to be written
+                tasks = indexed_tasks if isinstance(pool, SupervisedPool) else _batches(indexed_tasks, chunksize)
+                results = _polled(pool, tasks)
+            else:
+                results = pool.imap_unordered(_extract_indexed, indexed_tasks, chunksize)
+            for result in results:
+                finished = []
+                result = collect(*result) if result is not None else None
+                if result is not None:
+                    idx, rows, fingerprint = result
+                    if control is not None:
+                        control.task_done()
+                    finished = [result]
+                    if ocr_stage is not None and any(OCR_CLIPS_KEY in row for row in rows):
+                        # Files with scanned areas wait for OCR; the rest are written at once
+                        finished = ocr_stage.submit(idx, rows, fingerprint)
+                if ocr_stage is not None:
+                    finished += ocr_stage.ready()
+                for item in finished:
+                    finish(*item)
+                if control is not None and control.cancelled:
+                    break
+            else:
+                if ocr_stage is not None:
+                    for item in ocr_stage.drain():
+                        finish(*item)
+        finally:
+            # Release the feeder before the pool joins it on exit
+            if scheduler is not None:
+                scheduler.close()
+            if reorder:
+                reorder.close()
+            if control is not None:
+                control.close()
+            if ocr_stage is not None:
+                ocr_stage.close()
+            if recorder is not None:
+                recorder.close()
+            if cache_db:
+                cache_db.close()
+            error_log.close()
+
+    return {
+        'csv_path': csv_path,
+        'files': queued['files'],
+        'rows': written,
+        'errors': error_log.count,
+        'error_log': error_log.path if error_log.count else None,
+        'bytes_read': bytes_read,
+        'cancelled': control is not None and control.cancelled,
+        'duplicates': sum(len(copies) for copies in duplicates.values()),
+        'duplicate_report': duplicate_report,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Extract title-block text from PDFs without the GUI.")
+    parser.add_argument("inputs", nargs='+', help="Folder(s) and/or PDF files to process")
+    parser.add_argument("--bbox", help=f"Bounding box JSON (default: {BBOX_JSON_NAME} in the input folder)")
+    parser.add_argument("-o", "--output",
+                        help=f"Output .csv, .sqlite or .parquet file (default: {CSV_NAME} next to the bbox JSON)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="Output format (default: from the --output extension, else csv)")
+    parser.add_argument("--metadata", action="store_true",
+                        help="Add page_size, page_count, duration_ms and error columns to CSV output")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Search input folders recursively")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="Only process files matching this glob (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Skip files and folders matching this glob (repeatable)")
+    parser.add_argument("--pages", metavar="SPEC",
+                        help="Pages to extract per file, 'all' or e.g. '1,3-5,last' (default: first page); "
+                             "one row per page")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Extract byte-identical files once and repeat their rows for each copy")
+    parser.add_argument("--debug", action="store_true", help="Save a _debug.pdf copy with the areas drawn")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write per-file stage timings to a .jsonl file or Prometheus .prom file")
+    parser.add_argument("--profile-every", type=int, metavar="N", help="Profile every Nth file")
+    parser.add_argument("--profile-dir", help="Folder for profiles (default: <output>_profiles)")
+    parser.add_argument("--profiler", choices=PROFILERS, default='cprofile',
+                        help="cprofile: .prof files for pstats/snakeviz; pyinstrument: call-tree .txt")
+    parser.add_argument("--ocr", action="store_true",
+                        help="OCR empty areas on pages without a text layer (needs Tesseract)")
+    parser.add_argument("--ocr-dpi", type=int, default=OCR_DPI,
+                        help=f"Resolution of the clips rendered for OCR (default: {OCR_DPI})")
+    parser.add_argument("--ocr-lang", default=OCR_LANG, help=f"Tesseract language(s) (default: {OCR_LANG})")
+    parser.add_argument("--ocr-workers", type=int, default=1, help="Concurrent Tesseract processes (default: 1)")
+    parser.add_argument("-j", "--processes", type=int, help="Number of worker processes")
+    parser.add_argument("--engine", choices=ENGINES, default='textbox',
+                        help="textbox: get_textbox per area; index: one text page, same output; "
+                             "words: whole words; numpy: whole words, vectorized for many areas")
+    parser.add_argument("--min-overlap", type=float, default=0.0,
+                        help="numpy engine: fraction of a word that must lie inside an area")
+    parser.add_argument("--open-mode", choices=OPEN_MODES, default='file',
+                        help="file: MuPDF file stream; mmap: zero-copy memory map, only touched pages are read")
+    parser.add_argument("--io-stats", action="store_true",
+                        help="Add a bytes_read column: bytes read from storage per file, measured cold")
+    parser.add_argument("--timeout", type=float, help="Seconds a single file may take before it is abandoned")
+    parser.add_argument("--max-rss", type=float, help="Memory ceiling per worker in MB (Linux)")
+    parser.add_argument("--max-tasks-per-worker", type=int, help="Replace each worker after N files")
+    parser.add_argument("--chunksize", type=int, help="Tasks per worker batch (default: adaptive)")
+    parser.add_argument("--ordered", action="store_true", help="Write rows in input order")
+    parser.add_argument("--window", type=int, default=1000,
+                        help="Maximum files held back for --ordered (default: 1000)")
+    parser.add_argument("--flush-every", type=int, default=100, help="Flush the CSV every N rows")
+    parser.add_argument("--cache", nargs='?', const=True, metavar="PATH",
+                        help="Reuse text of unchanged files from an extraction cache "
+                             "(default path: <output>_cache.sqlite)")
+    parser.add_argument("--no-cache", action="store_true", help="Re-extract every file (the default)")
+    parser.add_argument("--fsync-interval", type=float, default=5.0,
+                        help="Minimum seconds between fsyncs of the CSV")
+
+    args = parser.parse_args()
+    if args.pages:
+        try:
+            check_pages(args.pages)
+        except ValueError:
+            parser.error(f"invalid --pages: {args.pages}")
+
+    bbox_path = args.bbox
+    if not bbox_path:
+        if not os.path.isdir(args.inputs[0]):
+            parser.error("--bbox is required when the first input is not a folder")
+        bbox_path = os.path.join(args.inputs[0], BBOX_JSON_NAME)
+    if not os.path.exists(bbox_path):
+        print(f"Bounding box file not found: {bbox_path}")
+        sys.exit(1)
+
+    summary = extract(args.inputs, bbox_path, csv_path=args.output,
+                      debug=args.debug, processes=args.processes, ordered=args.ordered,
+                      window=args.window, flush_every=args.flush_every,
+                      fsync_interval=args.fsync_interval,
+                      cache=False if args.no_cache else (args.cache or False),
+                      chunksize=args.chunksize, engine=args.engine, min_overlap=args.min_overlap,
+                      open_mode=args.open_mode, io_stats=args.io_stats, timeout=args.timeout,
+                      max_rss_mb=args.max_rss, maxtasksperchild=args.max_tasks_per_worker,
+                      recursive=args.recursive, include=args.include, exclude=args.exclude,
+                      output_format=args.format, metadata=args.metadata, pages=args.pages,
+                      ocr=args.ocr, ocr_dpi=args.ocr_dpi, ocr_lang=args.ocr_lang,
+                      ocr_workers=args.ocr_workers, dedup=args.dedup, metrics=args.metrics,
+                      profile_every=args.profile_every, profile_dir=args.profile_dir,
+                      profiler=args.profiler)
+    if summary['files'] == 0:
+        print("No PDF files found.")
+        sys.exit(1)
+    if summary['rows'] != summary['files']:
+        print(f"Saved {summary['rows']} page(s) from {summary['files']} file(s) to {summary['csv_path']}")
+    else:
+        print(f"Saved extracted text for {summary['files']} file(s) to {summary['csv_path']}")
+    if summary['duplicates']:
+        print(f"Skipped {summary['duplicates']} duplicate file(s). Groups saved to {summary['duplicate_report']}")
+    if args.io_stats and summary['bytes_read'] is not None:
+        print(f"Read {summary['bytes_read'] / 1e6:.1f} MB from the extracted files")
+    if summary['errors']:
+        print(f"{summary['errors']} file(s) failed. Details saved to {summary['error_log']}")
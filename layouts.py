@@ -0,0 +1,96 @@
+"""
+Layouts per page class and page selection for multi-page drawing sets.
+
+A plain ``bounding_boxes.json`` is one layout used for every page. Sets that
+mix sheet sizes or orientations can instead give one layout per page class
+under ``_layouts``:
+
+    {"_layouts": {
+        "A1_LS":   {"title": [x0, y0, x1, y1], "_anchor": {...}},
+        "PO":      {"title": [...]},
+        "default": {"title": [...]}
+    }}
+
+Each page is matched by its size class from ``pagesize.page_size_class``
+(e.g. ``A1_LS``), then by orientation alone (``LS``/``PO``), then by sheet
+size alone (``A1``), then ``default``. Pages that match no layout are skipped.
+"""
+from anchor import split_layout
+
+LAYOUTS_KEY = '_layouts'
+DEFAULT_LAYOUT = 'default'
+
+
+class LayoutSet:
+    """
+    The layouts of one bbox JSON, by name.
+
+    A plain layout becomes a single layout named ``''`` that matches every
+    page, so callers handle both formats the same way.
+    """
+
+    def __init__(self, layout):
+        self.multi = LAYOUTS_KEY in layout
+        if self.multi:
+            self.layouts = {name: split_layout(areas) for name, areas in layout[LAYOUTS_KEY].items()}
+        else:
+            self.layouts = {'': split_layout(layout)}
+
+    def select(self, size_class):
+        """Return the name of the layout for a page of ``size_class``, or None."""
+        if not self.multi:
+            return ''
+        size, _, orientation = size_class.rpartition('_')
+        for name in (size_class, orientation, size, DEFAULT_LAYOUT):
+            if name in self.layouts:
+                return name
+        return None
+
+    def __contains__(self, name):
+        return name in self.layouts
+
+    def areas(self, name):
+        """Return ``(areas, anchor)`` of a layout."""
+        return self.layouts[name]
+
+    @property
+    def fieldnames(self):
+        """Area names of all layouts, in order of first appearance."""
+        names = {}
+        for areas, _ in self.layouts.values():
+            names.update(dict.fromkeys(areas))
+        return list(names)
+
+
+def parse_pages(spec, page_count):
+    """
+    Turn a page selection into sorted 0-based page indices.
+
+    Args:
+        spec (str): ``'all'`` or a comma-separated list of 1-based pages and
+            ranges, e.g. ``'1,3-5,last'``. Pages past the end are ignored.
+        page_count (int): Pages in the document.
+
+    Returns:
+        list: 0-based indices.
+    """
+    if spec.strip().lower() == 'all':
+        return list(range(page_count))
+
+    def page_number(token):
+        return page_count if token.strip().lower() == 'last' else int(token)
+
+    selected = set()
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        first, sep, last = part.partition('-')
+        start = page_number(first)
+        end = page_number(last) if sep else start
+        selected.update(range(max(start, 1) - 1, min(end, page_count)))
+    return sorted(selected)
+
+
+def check_pages(spec):
+    """Raise ``ValueError`` if a page selection cannot be parsed."""
+    parse_pages(spec, 1)
@@ -4,77 +4,29 @@ from PIL import Image, ImageTk
 import fitz  # PyMuPDF
 import json
 import os
-import csv
-import glob
+import queue
+import random
+import functools
+import time
+import threading
 import multiprocessing
-
-# === PDF text extraction function for worker ===
-
-def convert_bbox(area, page_height, shrink=0):
-    """
-    Convert a bbox from PDF (origin bottom-left) to PyMuPDF (origin top-left),
-    and optionally shrink it on all sides.
-
-    Args:
-        area (tuple): (x0, y0, x1, y1) in PDF coordinates.
-        page_height (float): Page height to flip Y coordinates.
-        shrink (float): Margin to subtract from all four sides.
-
-    Returns:
-        tuple: (x0, y0, x1, y1) ready to pass to fitz.Rect(*coords)
-    """
-    x0, y0, x1, y1 = area
-
-    # Convert to PyMuPDF coordinate system 
-    top =  y1
-    bottom = y0
-    left = x0
-    right = x1
-
-    # Apply shrinking
-    if shrink > 0:
-        left += shrink
-        right -= shrink
-        top -= shrink
-        bottom += shrink
-
-    return (left, bottom, right, top)
-
-
-def extract_text_from_pdf(args):
-    pdf_path, bbox_dict, debug = args
-    row = {'filename': os.path.basename(pdf_path)}
-    try:
-        doc = fitz.open(pdf_path)
-        page = doc.load_page(0)
-        for name, coords in bbox_dict.items():
-            coords = convert_bbox(coords, page.rect.height, shrink=0)
-            rect = fitz.Rect(*coords)
-
-            # DEBUG: draw the rectangle in red
-            if debug:
-                page.draw_rect(rect, color=(1, 0, 0), width=1)
-
-            text = page.get_textbox(rect)
-            if text:
-                text = text.replace('\n', ' ').replace('\r', ' ')
-            row[name] = text
-
-        # DEBUG: save PDF with boxes if debug mode is on
-        if debug:
-            debug_path = os.path.splitext(pdf_path)[0] + "_debug.pdf"
-            doc.save(debug_path)
-        doc.close()
-
-    except Exception as e:
-        row['error'] = f"{e} (file: {pdf_path})"
-
-    return row
+from layouts import LAYOUTS_KEY, LayoutSet
+from pagesize import page_size_class
+from extract import (BBOX_JSON_NAME, CSV_NAME, ExtractionControl, collect_pdf_files, extract,
+                     extract_text_from_pdf, load_bbox_dict)
+from textindex import TextIndex
+from tiles import TileCache
+
+RESIZE_DEBOUNCE_MS = 150
+POLL_MS = 100
+PROGRESS_POLL_MS = 250  # Progress window redraw interval, independent of how fast files finish
+PREVIEW_WIDTH = 360  # px
 
 class PDFCropper(tk.Toplevel):
     COLORS = ["red", "orange", "blue", "purple", "black", "green", "cyan", "magenta"]
 
-    def __init__(self, master, image, scale, pdf_bbox, display_height, bbox_dict, pdf_path=None):
+    def __init__(self, master, image, scale, pdf_bbox, display_height, bbox_dict, pdf_path=None, page=None,
+                 pdf_files=None):
         super().__init__(master)
         self.title("Draw a box to select area")
         self.geometry("1920x1000")
@@ -94,7 +46,20 @@ class PDFCropper(tk.Toplevel):
         self.color_map = {}
         self.color_index = 0
         self.rectangles = []  # List of tuples (canvas_rect_id, bbox_name)
-
+        self.box_items = {}  # bbox_name -> (canvas_rect_id, canvas_text_id)
+
+        # Only the tiles under the viewport are rendered; with the page they
+        # are re-rendered sharp at each zoom level instead of scaled up
+        self.tiles = TileCache(image, pdf_bbox, page=page, convert=ImageTk.PhotoImage)
+        self.tile_items = {}  # (zoom, tx, ty) -> (canvas_image_id, photo)
+        self._view_job = None
+        self._resize_job = None
+
+        # The sample page's text is indexed once so the preview can be
+        # recomputed on every drag motion
+        self.text_index = TextIndex(page) if page is not None else None
+        self.pdf_files = pdf_files or []
+        self.test_results = None  # queue.Queue while a test run is going
         # Toolbar frame (top horizontal bar)
         self.toolbar = tk.Frame(self)
         self.toolbar.pack(side=tk.TOP, fill=tk.X)
@@ -108,6 +73,15 @@ class PDFCropper(tk.Toplevel):
         self.finish_button = tk.Button(self.toolbar, text="Finish", command=self.finish)
         self.finish_button.pack(side=tk.LEFT, padx=5, pady=5)
 
+        self.sample_size = tk.IntVar(value=5)
+        self.test_button = tk.Button(self.toolbar, text="Test on", command=self.test_random_files)
+        self.test_spinbox = tk.Spinbox(self.toolbar, from_=1, to=100, width=4, textvariable=self.sample_size)
+        self.test_label = tk.Label(self.toolbar, text="random files")
+        if self.pdf_files:
+            self.test_button.pack(side=tk.LEFT, padx=(5, 0), pady=5)
+            self.test_spinbox.pack(side=tk.LEFT, pady=5)
+            self.test_label.pack(side=tk.LEFT, padx=(2, 5), pady=5)
+
         # Name entry below toolbar
         self.name_entry = tk.Entry(self)
         self.name_entry.pack(side=tk.TOP, fill=tk.X, padx=5, pady=(0, 5))
@@ -117,6 +91,20 @@ class PDFCropper(tk.Toplevel):
         self.result_label = tk.Label(self, text="Draw a rectangle to select area")
         self.result_label.pack(side=tk.BOTTOM, fill=tk.X)
 
+        # Live preview of the text each area captures on the sample page
+        self.preview_frame = None
+        if self.text_index is not None:
+            self.preview_frame = tk.Frame(self, width=PREVIEW_WIDTH)
+            self.preview_frame.pack(side=tk.RIGHT, fill=tk.Y)
+            self.preview_frame.pack_propagate(False)
+            tk.Label(self.preview_frame, text="Selection", anchor="w", font=("TkDefaultFont", 9, "bold")).pack(fill=tk.X)
+            self.selection_preview = tk.Label(self.preview_frame, text="", anchor="nw", justify=tk.LEFT,
+                                              wraplength=PREVIEW_WIDTH - 10, height=4)
+            self.selection_preview.pack(fill=tk.X)
+            tk.Label(self.preview_frame, text="Saved areas", anchor="w", font=("TkDefaultFont", 9, "bold")).pack(fill=tk.X)
+            self.area_preview = tk.Text(self.preview_frame, wrap="word", state="disabled")
+            self.area_preview.pack(fill=tk.BOTH, expand=True)
+
         # Canvas for image and drawing
         self.canvas = tk.Canvas(self, width=self.view_width, height=self.view_height)
         self.canvas.pack(fill=tk.BOTH, expand=True)
@@ -157,6 +145,7 @@ class PDFCropper(tk.Toplevel):
 
         if pdf_path:
             self.load_existing_bboxes(pdf_path)
+        self.refresh_area_preview()
 
     def generate_color(self, name):
         if name not in self.color_map:
@@ -173,47 +162,96 @@ class PDFCropper(tk.Toplevel):
         try:
             with open(json_path, 'r') as f:
                 existing = json.load(f)
+            if LAYOUTS_KEY in existing:
+                # Edit the layout that extraction would use for the sample page
+                x0, y0, x1, y1 = self.pdf_bbox
+                layout_name = LayoutSet(existing).select(page_size_class(x1 - x0, y1 - y0))
+                existing = existing[LAYOUTS_KEY].get(layout_name, {})
             self.bbox_dict.clear()
             self.color_map.clear()
             self.color_index = 0
-            self.rectangles.clear()
-            self.bbox_dict.update({k: tuple(v) for k, v in existing.items()})
+            self.clear_boxes()
+            self.bbox_dict.update({k: tuple(v) for k, v in existing.items() if not k.startswith('_')})
             self.update_view()
-            self.result_label.config(text=f"Loaded {len(existing)} areas from JSON")
+            self.refresh_area_preview()
+            self.result_label.config(text=f"Loaded {len(self.bbox_dict)} areas from JSON")
         except Exception as e:
             print(f"Error loading bounding boxes: {e}")
             self.result_label.config(text=f"Error loading JSON: {e}")
 
+    def schedule_view(self):
+        # Coalesce bursts of pan and zoom events into one redraw per idle cycle
+        if self._view_job is None:
+            self._view_job = self.after_idle(self._run_scheduled_view)
+
+    def _run_scheduled_view(self):
+        self._view_job = None
+        self.update_view()
+
     def update_view(self):
-        zoomed_w = int(self.image.width * self.zoom_level)
-        zoomed_h = int(self.image.height * self.zoom_level)
+        zoomed_w, zoomed_h = self.tiles.zoomed_size(self.zoom_level)
         self.offset_x = min(max(self.offset_x, 0), max(0, zoomed_w - self.view_width))
         self.offset_y = min(max(self.offset_y, 0), max(0, zoomed_h - self.view_height))
-        try:
-            resample_filter = Image.Resampling.LANCZOS
-        except AttributeError:
-            resample_filter = Image.LANCZOS
-        zoomed_image = self.image.resize((zoomed_w, zoomed_h), resample_filter)
-        cropped = zoomed_image.crop((self.offset_x, self.offset_y, self.offset_x + self.view_width, self.offset_y + self.view_height))
-        self.tk_image = ImageTk.PhotoImage(cropped)
-        self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor="nw", image=self.tk_image)
+
+        # Move the tiles that stay on screen, render the ones that scrolled in
+        zoom_key = round(self.zoom_level, 6)
+        visible = set()
+        for tx, ty in self.tiles.visible(self.zoom_level, self.offset_x, self.offset_y,
+                                         self.view_width, self.view_height):
+            key = (zoom_key, tx, ty)
+            visible.add(key)
+            x = tx * self.tiles.tile_size - self.offset_x
+            y = ty * self.tiles.tile_size - self.offset_y
+            if key in self.tile_items:
+                self.canvas.coords(self.tile_items[key][0], x, y)
+            else:
+                photo = self.tiles.get(self.zoom_level, tx, ty)
+                item = self.canvas.create_image(x, y, anchor="nw", image=photo, tags=("tile",))
+                self.tile_items[key] = (item, photo)
+        for key in [k for k in self.tile_items if k not in visible]:
+            self.canvas.delete(self.tile_items.pop(key)[0])
+        self.canvas.tag_lower("tile")
+
+        # The selection is in screen coordinates and no longer matches the view
+        if self.rect:
+            self.canvas.delete(self.rect)
+            self.rect = None
         self.draw_existing_boxes()
 
-    def draw_existing_boxes(self):
-        # Delete all previous rectangles and texts from canvas
-        for rect_id, _ in self.rectangles:
+    def clear_boxes(self):
+        for rect_id, text_id in self.box_items.values():
             self.canvas.delete(rect_id)
+            self.canvas.delete(text_id)
+        self.box_items.clear()
         self.rectangles.clear()
 
+    def draw_existing_boxes(self):
+        # Remove items of deleted areas, then move or create the rest in place
+        for name in [n for n in self.box_items if n not in self.bbox_dict]:
+            rect_id, text_id = self.box_items.pop(name)
+            self.canvas.delete(rect_id)
+            self.canvas.delete(text_id)
+
+        pdf_x0, pdf_y0, pdf_x1, pdf_y1 = self.pdf_bbox
+        sx = self.image.width * self.zoom_level / (pdf_x1 - pdf_x0)
+        sy = self.image.height * self.zoom_level / (pdf_y1 - pdf_y0)
         for name, (x0, y0, x1, y1) in self.bbox_dict.items():
-            color = self.generate_color(name)
-            x0s = (x0 - self.pdf_bbox[0]) / (self.pdf_bbox[2] - self.pdf_bbox[0]) * self.image.width * self.zoom_level - self.offset_x
-            y0s = (y0 - self.pdf_bbox[1]) / (self.pdf_bbox[3] - self.pdf_bbox[1]) * self.image.height * self.zoom_level - self.offset_y
-            x1s = (x1 - self.pdf_bbox[0]) / (self.pdf_bbox[2] - self.pdf_bbox[0]) * self.image.width * self.zoom_level - self.offset_x
-            y1s = (y1 - self.pdf_bbox[1]) / (self.pdf_bbox[3] - self.pdf_bbox[1]) * self.image.height * self.zoom_level - self.offset_y
-            rect_id = self.canvas.create_rectangle(x0s, y0s, x1s, y1s, outline=color, width=2, tags=("rect",))
-            text_id = self.canvas.create_text(x0s + 5, y0s + 10, text=name, anchor="nw", fill=color)
+            x0s = (x0 - pdf_x0) * sx - self.offset_x
+            y0s = (y0 - pdf_y0) * sy - self.offset_y
+            x1s = (x1 - pdf_x0) * sx - self.offset_x
+            y1s = (y1 - pdf_y0) * sy - self.offset_y
+            if name in self.box_items:
+                rect_id, text_id = self.box_items[name]
+                self.canvas.coords(rect_id, x0s, y0s, x1s, y1s)
+                self.canvas.coords(text_id, x0s + 5, y0s + 10)
+            else:
+                color = self.generate_color(name)
+                rect_id = self.canvas.create_rectangle(x0s, y0s, x1s, y1s, outline=color, width=2, tags=("rect",))
+                text_id = self.canvas.create_text(x0s + 5, y0s + 10, text=name, anchor="nw", fill=color)
+                self.box_items[name] = (rect_id, text_id)
+
+        self.rectangles = []
+        for name, (rect_id, text_id) in self.box_items.items():
             self.rectangles.append((rect_id, name))
             self.rectangles.append((text_id, None))  # Text is not linked to bbox name
 
@@ -227,13 +265,26 @@ class PDFCropper(tk.Toplevel):
     def on_drag(self, event):
         self.end_x = event.x
         self.end_y = event.y
-        self.canvas.coords(self.rect, self.start_x, self.start_y, self.end_x, self.end_y)
+        if self.rect:
+            self.canvas.coords(self.rect, self.start_x, self.start_y, self.end_x, self.end_y)
+        if self.text_index is not None:
+            box = self.screen_to_pdf(self.start_x, self.start_y, self.end_x, self.end_y)
+            self.selection_preview.config(text=self.preview_text(box))
 
     def on_release(self, event):
         self.end_x = event.x
         self.end_y = event.y
-        x0, y0 = min(self.start_x, self.end_x), min(self.start_y, self.end_y)
-        x1, y1 = max(self.start_x, self.end_x), max(self.start_y, self.end_y)
+        self.last_box = self.screen_to_pdf(self.start_x, self.start_y, self.end_x, self.end_y)
+        self.result_label.config(
+            text=f"Selected area: x0={self.last_box[0]:.2f}, y0={self.last_box[1]:.2f}, x1={self.last_box[2]:.2f}, y1={self.last_box[3]:.2f}"
+        )
+        if self.text_index is not None:
+            self.selection_preview.config(text=self.preview_text(self.last_box))
+
+    def screen_to_pdf(self, sx0, sy0, sx1, sy1):
+        """Convert a rectangle dragged on the canvas to PDF coordinates."""
+        x0, y0 = min(sx0, sx1), min(sy0, sy1)
+        x1, y1 = max(sx0, sx1), max(sy0, sy1)
         x0_img = (x0 + self.offset_x) / self.zoom_level
         x1_img = (x1 + self.offset_x) / self.zoom_level
         y0_img = (y0 + self.offset_y) / self.zoom_level
@@ -243,10 +294,23 @@ class PDFCropper(tk.Toplevel):
         x1_pdf = pdf_x0 + (x1_img / self.image.width) * (pdf_x1 - pdf_x0)
         y0_pdf = pdf_y0 + (y0_img / self.image.height) * (pdf_y1 - pdf_y0)
         y1_pdf = pdf_y0 + (y1_img / self.image.height) * (pdf_y1 - pdf_y0)
-        self.last_box = (min(x0_pdf, x1_pdf), min(y0_pdf, y1_pdf), max(x0_pdf, x1_pdf), max(y0_pdf, y1_pdf))
-        self.result_label.config(
-            text=f"Selected area: x0={self.last_box[0]:.2f}, y0={self.last_box[1]:.2f}, x1={self.last_box[2]:.2f}, y1={self.last_box[3]:.2f}"
-        )
+        return (min(x0_pdf, x1_pdf), min(y0_pdf, y1_pdf), max(x0_pdf, x1_pdf), max(y0_pdf, y1_pdf))
+
+    def preview_text(self, box):
+        # Same text and newline handling as the batch run's 'index' engine
+        text = self.text_index.query(box)
+        return text.replace('\n', ' ').replace('\r', ' ') if text else "(no text)"
+
+    def refresh_area_preview(self):
+        if self.text_index is None:
+            return
+        self.area_preview.config(state="normal")
+        self.area_preview.delete("1.0", tk.END)
+        for name, box in self.bbox_dict.items():
+            self.area_preview.insert(tk.END, f"{name}\n", ("name",))
+            self.area_preview.insert(tk.END, f"{self.preview_text(box)}\n\n")
+        self.area_preview.tag_config("name", font=("TkDefaultFont", 9, "bold"))
+        self.area_preview.config(state="disabled")
 
     def save_area(self):
         name = self.name_entry.get().strip()
@@ -259,6 +323,7 @@ class PDFCropper(tk.Toplevel):
             if self.rect:
                 self.canvas.delete(self.rect)
             self.update_view()
+            self.refresh_area_preview()
         else:
             self.result_label.config(text="Please select an area and enter a name.")
 
@@ -277,6 +342,7 @@ class PDFCropper(tk.Toplevel):
                             del self.bbox_dict[name]
                         self.rectangles = [r for r in self.rectangles if r[0] != rect_id]
                         self.update_view()
+                        self.refresh_area_preview()
                         self.result_label.config(text=f"Deleted area '{name}'")
                         return
 
@@ -290,7 +356,7 @@ class PDFCropper(tk.Toplevel):
             self.offset_x -= dx
             self.offset_y -= dy
             self.pan_start = (event.x, event.y)
-            self.update_view()
+            self.schedule_view()
 
     def on_mousewheel(self, event):
         delta = getattr(event, 'delta', 0)
@@ -316,10 +382,13 @@ class PDFCropper(tk.Toplevel):
             new_h = int(self.image.height * new_zoom)
             self.offset_x = int(rel_x * new_w - self.view_width // 2)
             self.offset_y = int(rel_y * new_h - self.view_height // 2)
-            self.update_view()
+            self.schedule_view()
+
+    def preview_width(self):
+        return PREVIEW_WIDTH if self.preview_frame is not None else 0
 
     def resize_image_to_window(self):
-        win_width = self.winfo_width()
+        win_width = self.winfo_width() - self.preview_width()
         win_height = self.winfo_height() - 100
         if win_width > 1 and win_height > 1:
             self.view_width = win_width
@@ -329,11 +398,65 @@ class PDFCropper(tk.Toplevel):
 
     def on_window_resize(self, event):
         if event.widget == self:
-            self.view_width = max(200, event.width)
-            self.view_height = max(200, event.height - 100)
+            # Window managers send a stream of <Configure> events while dragging;
+            # only redraw once the size has settled
+            if self._resize_job is not None:
+                self.after_cancel(self._resize_job)
+            self._resize_job = self.after(RESIZE_DEBOUNCE_MS, self._apply_resize, event.width, event.height)
+
+    def _apply_resize(self, width, height):
+        self._resize_job = None
+        view_width, view_height = max(200, width - self.preview_width()), max(200, height - 100)
+        if (view_width, view_height) != (self.view_width, self.view_height):
+            self.view_width, self.view_height = view_width, view_height
             self.canvas.config(width=self.view_width, height=self.view_height)
             self.update_view()
 
+    def test_random_files(self):
+        """Run the current layout on a random sample of the folder without blocking the editor."""
+        if self.test_results is not None:
+            return  # A test run is still going
+        if not self.bbox_dict:
+            self.result_label.config(text="Save at least one area before testing.")
+            return
+        sample = random.sample(self.pdf_files, min(self.sample_size.get(), len(self.pdf_files)))
+        columns = ['filename'] + list(self.bbox_dict) + ['error']
+
+        win = tk.Toplevel(self)
+        win.title(f"Test run on {len(sample)} file(s)")
+        tree = ttk.Treeview(win, columns=columns, show="headings")
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=160, stretch=True)
+        tree.pack(fill=tk.BOTH, expand=True)
+
+        self.test_results = queue.Queue()
+        self.test_button.config(state="disabled")
+        self.result_label.config(text=f"Testing layout on {len(sample)} file(s)...")
+        worker = threading.Thread(target=run_sample, args=(sample, dict(self.bbox_dict), self.test_results),
+                                  daemon=True)
+        worker.start()
+        self.after(POLL_MS, self._poll_test_results, tree, columns, len(sample))
+
+    def _poll_test_results(self, tree, columns, total):
+        finished = False
+        while True:
+            try:
+                row = self.test_results.get_nowait()
+            except queue.Empty:
+                break
+            if row is None:
+                finished = True
+                break
+            if tree.winfo_exists():
+                tree.insert("", tk.END, values=[row.get(column) or "" for column in columns])
+        if finished:
+            self.test_results = None
+            self.test_button.config(state="normal")
+            self.result_label.config(text=f"Tested layout on {total} file(s)")
+        else:
+            self.after(POLL_MS, self._poll_test_results, tree, columns, total)
+
     def finish(self):
         self.finished = True
         self.destroy()
@@ -342,6 +465,159 @@ class PDFCropper(tk.Toplevel):
 
 
 
+class ExtractionProgress(tk.Toplevel):
+    """
+    Progress window for a batch run with pause and cancel.
+
+    ``extract`` runs in a background thread and posts progress to a queue;
+    the window drains it every ``PROGRESS_POLL_MS``, so it stays responsive
+    and redraws at a fixed rate however fast files complete.
+    """
+
+    def __init__(self, master, pdf_files, bbox_dict, csv_path, debug=False, on_finish=None):
+        super().__init__(master)
+        self.title("Extracting Text from PDFs (Parallel)")
+        self.csv_path = csv_path
+        self.total = len(pdf_files)
+        self.on_finish = on_finish
+        self.summary = None
+        self.events = queue.Queue()
+        self.control = ExtractionControl()
+        self.done = 0
+        self.started = time.monotonic()
+        self.paused_at = None
+        self.paused_for = 0.0
+
+        self.label = tk.Label(self, text="Extracting text from PDFs...")
+        self.label.pack(padx=20, pady=(20, 5))
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(self, variable=self.progress_var, maximum=self.total, length=400)
+        self.progress_bar.pack(padx=20, pady=(0, 5))
+        self.stats_label = tk.Label(self, text="", anchor="w", justify=tk.LEFT)
+        self.stats_label.pack(padx=20, fill=tk.X)
+
+        buttons = tk.Frame(self)
+        buttons.pack(pady=(5, 15))
+        self.pause_button = tk.Button(buttons, text="Pause", width=10, command=self.toggle_pause)
+        self.pause_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = tk.Button(buttons, text="Cancel", width=10, command=self.cancel)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        self.worker = threading.Thread(target=self._run, args=(pdf_files, bbox_dict, debug), daemon=True)
+        self.worker.start()
+        self.after(PROGRESS_POLL_MS, self._poll)
+
+    def _run(self, pdf_files, bbox_dict, debug):
+        try:
+            summary = extract(pdf_files, bbox_dict, csv_path=self.csv_path, debug=debug,
+                              progress=lambda done, total: self.events.put(('progress', done)),
+                              control=self.control)
+            self.events.put(('done', summary))
+        except Exception as e:
+            self.events.put(('failed', e))
+
+    def toggle_pause(self):
+        if self.control.paused:
+            self.control.resume()
+            self.paused_for += time.monotonic() - self.paused_at
+            self.paused_at = None
+            self.pause_button.config(text="Pause")
+            self.label.config(text="Extracting text from PDFs...")
+        else:
+            self.control.pause()
+            self.paused_at = time.monotonic()
+            self.pause_button.config(text="Resume")
+            self.label.config(text="Paused (files already started will finish)")
+
+    def cancel(self):
+        if self.summary is None and not self.control.cancelled:
+            self.control.cancel()
+            self.label.config(text="Cancelling...")
+            self.pause_button.config(state="disabled")
+            self.cancel_button.config(state="disabled")
+
+    def _poll(self):
+        finished = None
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'progress':
+                self.done = event[1]
+            else:
+                finished = event
+        self._show_stats()
+        if finished is None:
+            self.after(PROGRESS_POLL_MS, self._poll)
+        else:
+            self._finish(*finished)
+
+    def _show_stats(self):
+        self.progress_var.set(self.done)
+        elapsed = time.monotonic() - self.started - self.paused_for
+        if self.paused_at is not None:
+            elapsed -= time.monotonic() - self.paused_at
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate else None
+        text = f"{self.done} / {self.total} files   {rate:.1f} files/s"
+        if eta is not None and self.done < self.total:
+            text += f"   ETA {int(eta // 60)}:{int(eta % 60):02d}"
+        text += f"   {self.control.errors} error(s)"
+        self.stats_label.config(text=text)
+
+    def _finish(self, kind, result):
+        self.pause_button.config(state="disabled")
+        self.cancel_button.config(state="disabled")
+        if kind == 'failed':
+            print(f"Extraction failed: {result}")
+            self.label.config(text=f"Extraction failed: {result}")
+        else:
+            self.summary = result
+            if result['errors']:
+                print(f"\n{result['errors']} file(s) failed. Details saved to {result['error_log']}")
+            if result['cancelled']:
+                self.label.config(text=f"Cancelled after {result['rows']} file(s); partial results in {self.csv_path}")
+            else:
+                self.label.config(text=f"Saved extracted text to {self.csv_path}")
+        if self.on_finish:
+            self.after(1500, self.on_finish)
+
+
+def run_sample(pdf_files, bbox_dict, results):
+    """
+    Extract a layout from a few PDFs in worker processes for the editor's test run.
+
+    Runs in a background thread; each row is put on ``results`` as it
+    finishes, followed by None.
+    """
+    extract_one = functools.partial(extract_text_from_pdf, engine='index')
+    try:
+        with multiprocessing.Pool(min(len(pdf_files), multiprocessing.cpu_count())) as pool:
+            for row in pool.imap_unordered(extract_one, [(path, bbox_dict, False) for path in pdf_files]):
+                results.put(row)
+    except Exception as e:
+        results.put({'filename': '', 'error': str(e)})
+    finally:
+        results.put(None)
+
+
+def render_first_page(page, max_width=2000, max_height=2000):
+    """Render the first page of a PDF for the area editor."""
+    pix = page.get_pixmap(dpi=150, alpha=False)
+    pil_image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    pdf_rect = tuple(page.rect)
+
+    orig_width, orig_height = pil_image.size
+    scale = min(max_width / orig_width, max_height / orig_height, 1.0)
+    display_image = pil_image.resize(
+        (int(orig_width * scale), int(orig_height * scale)),
+        Image.Resampling.LANCZOS if hasattr(Image, 'Resampling') else Image.LANCZOS
+    )
+    return display_image, scale, pdf_rect
+
+
 if __name__ == '__main__':
     multiprocessing.freeze_support()  # Needed for Windows executables
 
@@ -353,45 +629,33 @@ if __name__ == '__main__':
         root.destroy()
         exit(1)
 
-    pdf_files = sorted(glob.glob(os.path.join(pdf_folder, '*.pdf')))
+    pdf_files = collect_pdf_files(pdf_folder)
     if not pdf_files:
         print("No PDF files found in the selected folder.")
         root.destroy()
         exit(1)
 
-    pdf_path = pdf_files[0]
-
-
-    MAX_WIDTH, MAX_HEIGHT = 2000, 2000
-
-    doc = fitz.open(pdf_path)
-    page = doc.load_page(0)  # first page
-    pix = page.get_pixmap(dpi=150, alpha=False)
-    pil_image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-
-    orig_width, orig_height = pil_image.size
-    scale = min(MAX_WIDTH / orig_width, MAX_HEIGHT / orig_height, 1.0)
-    display_image = pil_image.resize(
-        (int(orig_width * scale), int(orig_height * scale)),
-        Image.Resampling.LANCZOS if hasattr(Image, 'Resampling') else Image.LANCZOS
-    )
-
-    pdf_x0, pdf_y0, pdf_x1, pdf_y1 = page.rect
-
     # === Bounding Box Loading or Selection ===
-    bbox_json_path = os.path.join(pdf_folder, 'bounding_boxes.json')
-    csv_path = os.path.join(pdf_folder, 'extracted_text.csv')
+    bbox_json_path = os.path.join(pdf_folder, BBOX_JSON_NAME)
+    csv_path = os.path.join(pdf_folder, CSV_NAME)
     bbox_dict = {}
+    debug_mode = False
 
     if os.path.exists(bbox_json_path):
-        with open(bbox_json_path, 'r', encoding='utf-8') as f:
-            bbox_dict = json.load(f)
+        bbox_dict = load_bbox_dict(bbox_json_path)
         print(f"Loaded bounding boxes from {bbox_json_path}")
     else:
+        # Only render the sample page when the areas still have to be drawn
         root.withdraw()
-        app = PDFCropper(root, display_image, scale, (pdf_x0, pdf_y0, pdf_x1, pdf_y1), display_image.height, bbox_dict)
-        app.grab_set()
-        app.wait_window()
+        # Keep the sample open while the editor runs; it renders zoomed tiles from the page
+        with fitz.open(pdf_files[0]) as sample:
+            page = sample.load_page(0)  # first page
+            display_image, scale, pdf_rect = render_first_page(page)
+            app = PDFCropper(root, display_image, scale, pdf_rect, display_image.height, bbox_dict, page=page,
+                             pdf_files=pdf_files)
+            app.grab_set()
+            app.wait_window()
+        debug_mode = app.debug_var.get()
         if bbox_dict:
             with open(bbox_json_path, 'w', encoding='utf-8') as f:
                 json.dump(bbox_dict, f, indent=2)
@@ -399,53 +663,9 @@ if __name__ == '__main__':
 
     # === Only now run multiprocessing on prepared file list ===
     if bbox_dict:
-        cpu_count = multiprocessing.cpu_count()
-        pool = multiprocessing.Pool(cpu_count)
-        debug_mode = app.debug_var.get()  # or False
-        tasks = [(pdf_path, bbox_dict, debug_mode) for pdf_path in pdf_files]
-
-        # Progress GUI
-        progress_win = tk.Toplevel(root)
-        progress_win.title("Extracting Text from PDFs (Parallel)")
-        progress_label = tk.Label(progress_win, text="Extracting text from PDFs...")
-        progress_label.pack(padx=20, pady=(20, 5))
-        progress_var = tk.DoubleVar()
-        progress_bar = ttk.Progressbar(progress_win, variable=progress_var, maximum=len(pdf_files), length=400)
-        progress_bar.pack(padx=20, pady=(0, 20))
-        progress_win.update()
-
-        csv_rows = []
-        errors = []
-
-        for idx, result in enumerate(pool.imap_unordered(extract_text_from_pdf, tasks)):
-            if result is None:
-                continue
-            if 'error' in result:
-                errors.append(result)
-            csv_rows.append(result)
-            progress_var.set(idx + 1)
-            progress_win.update()
-
-        pool.close()
-        pool.join()
-
-        if errors:
-            error_log_path = os.path.splitext(csv_path)[0] + "_errors.log"
-            with open(error_log_path, 'w', encoding='utf-8') as ef:
-                for err in errors:
-                    ef.write(err['error'] + '\n')
-            print(f"\n{len(errors)} file(s) failed. Details saved to {error_log_path}")
-
-        # Save CSV
-        header = ['filename'] + list(bbox_dict.keys())
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=header)
-            writer.writeheader()
-            for row in csv_rows:
-                writer.writerow(row)
-
-        progress_label.config(text=f"Saved extracted text to {csv_path}")
-        progress_win.update()
-        progress_win.after(1500, progress_win.destroy)
+        # Progress GUI; extraction runs in the background while the main loop stays responsive
+        ExtractionProgress(root, pdf_files, bbox_dict, csv_path, debug=debug_mode, on_finish=root.quit)
+        root.mainloop()
+        root.destroy()
     else:
         print("No areas were selected.")
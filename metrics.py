@@ -0,0 +1,212 @@
+"""
+Per-file metrics, tracing and sampled profiling for the extraction pipeline.
+
+With tracing on, each worker times the stages of every file it extracts and
+returns them with the row under ``TRACE_KEY``; the main process adds the
+queue wait (time from dispatch to the worker picking the file up) and the
+output write, and hands everything to a ``MetricsRecorder``:
+
+- ``.jsonl``: one JSON object per file (or page), appended as it finishes,
+  for ad-hoc analysis (``jq``, pandas)
+- ``.prom``: Prometheus text format with per-stage histograms and per-worker
+  counters, rewritten atomically every ``PROM_WRITE_INTERVAL`` seconds so a
+  node_exporter textfile collector can pick it up during a run
+
+Stages, in seconds: ``queue_wait``, ``open``, ``load_page``, ``locate``
+(finding the title block and building the area rects), ``extract`` (all
+areas), ``ocr_render``, ``debug_save`` and ``write``. Comparing them tells
+whether a slow night was the disk (open, bytes read), MuPDF (load_page,
+extract) or the number of areas (extract per area).
+
+``profiled`` wraps every Nth file in cProfile, or pyinstrument if installed.
+Both are imported only when a file is actually profiled.
+"""
+import os
+import json
+import time
+import contextlib
+from collections import defaultdict
+
+TRACE_KEY = '_trace'  # Row key carrying a worker's trace to the main process
+METRICS_FORMATS = ('jsonl', 'prom')
+PROFILERS = ('cprofile', 'pyinstrument')
+STAGES = ('queue_wait', 'open', 'load_page', 'locate', 'extract', 'ocr_render', 'debug_save', 'write')
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)  # Seconds
+PROM_WRITE_INTERVAL = 10.0
+METRIC_PREFIX = 'pdf_extract'
+
+
+def format_for_metrics_path(path):
+    return 'prom' if os.path.splitext(path)[1].lower() in ('.prom', '.txt') else 'jsonl'
+
+
+def require_pyinstrument():
+    """Import pyinstrument on first use of ``profiler='pyinstrument'``."""
+    try:
+        import pyinstrument
+    except ImportError:
+        raise RuntimeError("The 'pyinstrument' profiler requires pyinstrument (pip install pyinstrument)") from None
+    return pyinstrument
+
+
+@contextlib.contextmanager
+def profiled(out_base, profiler='cprofile'):
+    """
+    Profile the enclosed block and save the result next to ``out_base``.
+
+    cProfile writes ``<out_base>.prof`` (open with ``snakeviz`` or ``pstats``);
+    pyinstrument writes a call tree to ``<out_base>.txt``.
+    """
+    if profiler == 'pyinstrument':
+        p = require_pyinstrument().Profiler()
+        p.start()
+        try:
+            yield
+        finally:
+            p.stop()
+            with open(out_base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(p.output_text())
+        return
+
+    import cProfile
+    p = cProfile.Profile()
+    p.enable()
+    try:
+        yield
+    finally:
+        p.disable()
+        p.dump_stats(out_base + '.prof')
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+class MetricsRecorder:
+    """
+    Collect one record per extracted file (or page) and export them.
+
+    Args:
+        path (str): Output file, ``.jsonl`` or ``.prom``.
+        fmt (str): One of ``METRICS_FORMATS``. Defaults to the extension of ``path``.
+    """
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt or format_for_metrics_path(path)
+        if self.fmt not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format: {self.fmt}")
+        self.file = open(path, 'w', encoding='utf-8') if self.fmt == 'jsonl' else None
+        self.stages = defaultdict(_Histogram)
+        self.files = defaultdict(int)  # Status -> count
+        self.workers = defaultdict(int)  # Worker pid -> files
+        self.bytes_read = 0
+        self.areas = 0
+        self.started = time.time()
+        self._last_write = time.monotonic()
+
+    def record(self, row, trace, queue_wait=None, write=None):
+        """
+        Add the metrics of one finished row.
+
+        Args:
+            row (dict): The output row (``filename``, ``page``, ``bytes_read``,
+                ``duration_ms``, ``error``).
+            trace (dict): The worker's trace, or None for rows that never
+                reached a worker (e.g. abandoned by the supervised pool).
+            queue_wait (float): Seconds from dispatch to the worker start.
+            write (float): Seconds spent writing the row.
+        """
+        trace = trace or {}
+        stages = dict(trace.get('stages', {}))
+        if queue_wait is not None:
+            stages['queue_wait'] = max(0.0, queue_wait)
+        if write is not None:
+            stages['write'] = write
+        status = 'error' if 'error' in row else 'ok'
+
+        self.files[status] += 1
+        if 'worker' in trace:
+            self.workers[trace['worker']] += 1
+        self.bytes_read += row.get('bytes_read') or 0
+        self.areas += trace.get('areas', 0)
+        for stage, seconds in stages.items():
+            self.stages[stage].observe(seconds)
+
+        if self.file is not None:
+            record = {
+                'ts': round(time.time(), 3),
+                'path': trace.get('path', row.get('filename')),
+                'page': row.get('page'),
+                'worker': trace.get('worker'),
+                'status': status,
+                'areas': trace.get('areas'),
+                'cached_areas': trace.get('cached_areas'),
+                'bytes_read': row.get('bytes_read'),
+                'duration_ms': row.get('duration_ms'),
+            }
+            record.update({f'{stage}_ms': round(seconds * 1000, 3) for stage, seconds in stages.items()})
+            if trace.get('areas') and 'extract' in stages:
+                record['extract_per_area_ms'] = round(stages['extract'] * 1000 / trace['areas'], 4)
+            if status == 'error':
+                record['error'] = row['error']
+            self.file.write(json.dumps(record) + '\n')
+        elif time.monotonic() - self._last_write >= PROM_WRITE_INTERVAL:
+            self.write_prometheus()
+
+    def write_prometheus(self):
+        """Rewrite the ``.prom`` file atomically with the totals so far."""
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_files_total Files (or pages) extracted, by outcome.",
+            f"# TYPE {p}_files_total counter",
+        ]
+        lines += [f'{p}_files_total{{status="{status}"}} {n}' for status, n in sorted(self.files.items())]
+        lines += [
+            f"# HELP {p}_stage_seconds Time per file spent in each pipeline stage.",
+            f"# TYPE {p}_stage_seconds histogram",
+        ]
+        for stage in [s for s in STAGES if s in self.stages]:
+            hist = self.stages[stage]
+            for bound, n in zip(BUCKETS, hist.buckets):
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {n}')
+            lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {hist.sum:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+        lines += [
+            f"# HELP {p}_worker_files_total Files (or pages) extracted per worker process.",
+            f"# TYPE {p}_worker_files_total counter",
+        ]
+        lines += [f'{p}_worker_files_total{{worker="{pid}"}} {n}' for pid, n in sorted(self.workers.items())]
+        lines += [
+            f"# HELP {p}_bytes_read_total Bytes read by the workers.",
+            f"# TYPE {p}_bytes_read_total counter",
+            f"{p}_bytes_read_total {self.bytes_read}",
+            f"# HELP {p}_areas_total Areas extracted (not served from the cache).",
+            f"# TYPE {p}_areas_total counter",
+            f"{p}_areas_total {self.areas}",
+            f"# HELP {p}_run_seconds Seconds since the run started.",
+            f"# TYPE {p}_run_seconds gauge",
+            f"{p}_run_seconds {time.time() - self.started:.3f}",
+        ]
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, self.path)
+        self._last_write = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        else:
+            self.write_prometheus()
@@ -0,0 +1,170 @@
+"""
+OCR fallback for scanned title blocks.
+
+Scanned sheets have no text layer, so every area comes back empty. With OCR
+enabled the extraction workers render just the clip of each empty area on
+such pages (``render_clip``) and hand the PNG back with the row; the main
+process OCRs the clips with the ``tesseract`` executable in a separate,
+bounded thread pool (``OCRStage``) so slow OCR never holds up native-text
+extraction in the worker processes.
+
+Results are cached by a hash of the rendered clip: stamps, logos and blank
+fields repeat across many sheets, and each distinct clip is OCR'd once per
+run (and once ever when an ``ExtractionCache`` is given).
+"""
+import shutil
+import hashlib
+import subprocess
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import fitz  # PyMuPDF
+
+OCR_DPI = 300
+OCR_LANG = 'eng'
+OCR_TIMEOUT = 60  # Seconds per clip
+OCR_CLIPS_KEY = '_ocr_clips'  # Row key carrying rendered clips from the workers
+MEMORY_CACHE_SIZE = 10000  # Clips whose text is kept in memory
+
+TESSERACT = shutil.which('tesseract')
+
+
+def has_text_layer(page):
+    """True if the page has any extractable text."""
+    return bool(page.get_text('text').strip())
+
+
+def render_clip(page, rect, dpi=OCR_DPI):
+    """Render one area of a page as a grayscale PNG for OCR."""
+    pix = page.get_pixmap(clip=rect, dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return pix.tobytes('png')
+
+
+def clip_hash(png):
+    return hashlib.blake2b(png, digest_size=16).hexdigest()
+
+
+def ocr_png(png, dpi=OCR_DPI, lang=OCR_LANG, timeout=OCR_TIMEOUT):
+    """
+    OCR a PNG with Tesseract.
+
+    Returns:
+        str: The recognized text with line breaks replaced by spaces.
+
+    Raises:
+        RuntimeError: If Tesseract is missing or fails.
+    """
+    if TESSERACT is None:
+        raise RuntimeError("OCR requires Tesseract on the PATH (https://github.com/tesseract-ocr/tesseract)")
+    # --psm 6: one uniform block of text, which suits a title-block field
+    proc = subprocess.run([TESSERACT, 'stdin', 'stdout', '--dpi', str(dpi), '-l', lang, '--psm', '6'],
+                          input=png, capture_output=True, timeout=timeout)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode('utf-8', 'replace').strip() or f"tesseract exited with {proc.returncode}")
+    return ' '.join(proc.stdout.decode('utf-8', 'replace').split())
+
+
+class OCRStage:
+    """
+    Bounded OCR pool for the files whose rows came back with rendered clips.
+
+    ``submit`` queues a file's rows and ``ready`` returns the files whose
+    clips have all been OCR'd. At most ``max_pending`` files wait at once; beyond that
+    ``submit`` blocks until some finish, which in turn holds back the pool.
+
+    Args:
+        workers (int): Concurrent Tesseract processes.
+        dpi (int): Resolution the clips were rendered at.
+        lang (str): Tesseract language(s), e.g. ``'eng+deu'``.
+        cache (ExtractionCache): Persist OCR text by clip hash across runs.
+        max_pending (int): Files held while their clips are OCR'd.
+    """
+
+    def __init__(self, workers=1, dpi=OCR_DPI, lang=OCR_LANG, cache=None, max_pending=64):
+        self.dpi = dpi
+        self.lang = lang
+        self.cache = cache
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr')
+        self.futures = OrderedDict()  # Clip hash -> Future of its text, LRU
+        self.pending = deque()  # (idx, rows, fingerprint, [(row, {name: Future})])
+        self.clips = 0
+        self.hits = 0
+
+    def _ocr(self, digest, png):
+        key = f"{self.lang}:{digest}"
+        if self.cache is not None:
+            text = self.cache.ocr_text(key)
+            if text is not None:
+                return text
+        text = ocr_png(png, self.dpi, self.lang)
+        if self.cache is not None:
+            self.cache.store_ocr(key, text)
+        return text
+
+    def _text(self, png):
+        """Future of a clip's text, shared by every identical clip."""
+        self.clips += 1
+        digest = clip_hash(png)
+        future = self.futures.get(digest)
+        if future is not None:
+            self.hits += 1
+            self.futures.move_to_end(digest)
+            return future
+        future = self.executor.submit(self._ocr, digest, png)
+        self.futures[digest] = future
+        if len(self.futures) > MEMORY_CACHE_SIZE:
+            self.futures.popitem(last=False)
+        return future
+
+    def submit(self, idx, rows, fingerprint):
+        """Queue a file's rows, some holding ``OCR_CLIPS_KEY``; returns files finished while waiting."""
+        texts = [(row, {name: self._text(png) for name, png in row.pop(OCR_CLIPS_KEY).items()})
+                 for row in rows if OCR_CLIPS_KEY in row]
+        self.pending.append((idx, rows, fingerprint, texts))
+        finished = []
+        while len(self.pending) > self.max_pending:
+            finished += self.ready(block=True)
+        return finished
+
+    def ready(self, block=False):
+        """
+        Return ``(idx, rows, fingerprint)`` for every file whose OCR is done.
+
+        With ``block`` wait until at least one file (if any is pending) is done.
+        """
+        def done(texts):
+            return all(f.done() for _, futures in texts for f in futures.values())
+
+        while block and self.pending and not any(done(texts) for _, _, _, texts in self.pending):
+            running = {f for _, _, _, texts in self.pending for _, futures in texts
+                       for f in futures.values() if not f.done()}
+            wait(running, return_when=FIRST_COMPLETED)
+
+        finished, waiting = [], deque()
+        for idx, rows, fingerprint, texts in self.pending:
+            if not done(texts):
+                waiting.append((idx, rows, fingerprint, texts))
+                continue
+            for row, futures in texts:
+                failed = {}
+                for name, future in futures.items():
+                    try:
+                        row[name] = future.result()
+                    except Exception as e:
+                        failed[name] = e
+                if failed:
+                    names = ', '.join(failed)
+                    row['error'] = f"OCR of {names} failed: {next(iter(failed.values()))} (file: {row['filename']})"
+            finished.append((idx, rows, fingerprint))
+        self.pending = waiting
+        return finished
+
+    def drain(self):
+        """Wait for all pending files and return them."""
+        finished = []
+        while self.pending:
+            finished += self.ready(block=True)
+        return finished
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,36 @@
+"""
+Standard sheet sizes and the size class of a page.
+
+Shared by ``sortpdfs.py``, which sorts files into folders by size class, and
+the extraction pipeline, which records it as a metadata column.
+"""
+
+# Common page sizes in points (1 pt = 1/72 inch)
+PAGE_SIZES = {
+    'A0': (2384, 3370),
+    'A1': (1684, 2384),
+    'A2': (1191, 1684),
+    'A3': (842, 1191),
+    'A4': (595, 842),
+}
+
+SIZE_TOLERANCE = 10  # pts
+
+
+def match_page_size(width: float, height: float) -> str:
+    """
+    Match the page dimensions to the nearest standard A-size.
+    Uses tolerance to handle minor variation in measurement.
+    Returns "Unknown" when no size matches.
+    """
+    for size, (w, h) in PAGE_SIZES.items():
+        if (abs(width - w) < SIZE_TOLERANCE and abs(height - h) < SIZE_TOLERANCE) or \
+           (abs(width - h) < SIZE_TOLERANCE and abs(height - w) < SIZE_TOLERANCE):
+            return size
+    return "Unknown"
+
+
+def page_size_class(width: float, height: float) -> str:
+    """Sheet size and orientation of a page as displayed, e.g. ``'A1_LS'``."""
+    orientation = 'LS' if width > height else 'PO'
+    return f"{match_page_size(width, height)}_{orientation}"
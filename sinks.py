@@ -0,0 +1,227 @@
+"""
+Output sinks for extraction results.
+
+Every sink takes the column names up front and accepts rows one at a time,
+so results stream to disk as workers finish:
+
+- ``csv``: ``CSVStreamWriter``, plain text, every value a string
+- ``sqlite``: one ``extracted_text`` table, rows inserted in batched transactions
+- ``parquet``: columnar file written in row groups (requires ``pyarrow``)
+
+The SQLite and Parquet sinks keep the metadata columns typed (``page_count``
+and ``bytes_read`` as integers, ``duration_ms`` as a float), so they can be
+queried without reparsing text. pyarrow is only imported when a Parquet
+sink is opened.
+"""
+import os
+import csv
+import time
+import sqlite3
+
+OUTPUT_FORMATS = ('csv', 'sqlite', 'parquet')
+FORMAT_EXTENSIONS = {'.csv': 'csv', '.sqlite': 'sqlite', '.db': 'sqlite', '.parquet': 'parquet'}
+
+# Columns that are not text; everything else (filename, areas, error, ...) is
+INTEGER_FIELDS = ('page', 'page_count', 'bytes_read')
+FLOAT_FIELDS = ('duration_ms',)
+
+TABLE_NAME = 'extracted_text'
+
+
+def require_pyarrow():
+    """Import pyarrow and its Parquet writer on first use; returns ``(pa, pq)``."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("The 'parquet' format requires pyarrow (pip install pyarrow)") from None
+    return pa, pq
+
+
+def format_for_path(path):
+    """Guess the output format from a file extension, defaulting to CSV."""
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'csv')
+
+
+class CSVStreamWriter:
+    """
+    Append rows to a CSV file as they arrive instead of collecting them first.
+
+    The file is flushed every ``flush_every`` rows and fsynced at most every
+    ``fsync_interval`` seconds, so memory stays flat and a crash only loses
+    the rows written since the last sync.
+    """
+
+    def __init__(self, csv_path, fieldnames, flush_every=100, fsync_interval=5.0):
+        self.csv_path = csv_path
+        self.flush_every = flush_every
+        self.fsync_interval = fsync_interval
+        self.rows_written = 0
+        self._unflushed = 0
+        self._last_sync = time.monotonic()
+        self.file = open(csv_path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.rows_written += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self, sync=False):
+        self.file.flush()
+        self._unflushed = 0
+        now = time.monotonic()
+        if sync or now - self._last_sync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self._last_sync = now
+
+    def close(self):
+        if not self.file.closed:
+            self.flush(sync=True)
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _typed(name, value):
+    # Values restored from the cache come back as text
+    if name in INTEGER_FIELDS:
+        return int(value) if value not in (None, '') else None
+    if name in FLOAT_FIELDS:
+        return float(value) if value not in (None, '') else None
+    return value
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(name):
+    if name in INTEGER_FIELDS:
+        return 'INTEGER'
+    if name in FLOAT_FIELDS:
+        return 'REAL'
+    return 'TEXT'
+
+
+class SQLiteSink:
+    """
+    Write rows to the ``extracted_text`` table of a SQLite database.
+
+    Rows are buffered and inserted with one ``executemany`` per transaction of
+    ``batch_size`` rows. An existing table is replaced, as the CSV file is.
+    """
+
+    def __init__(self, path, fieldnames, batch_size=1000):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._batch = []
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ', '.join(f"{_quote(name)} {_sql_type(name)}" for name in self.fieldnames)
+        self.conn.execute(f"DROP TABLE IF EXISTS {TABLE_NAME}")
+        self.conn.execute(f"CREATE TABLE {TABLE_NAME} ({columns})")
+        self.conn.commit()
+        self._insert = (f"INSERT INTO {TABLE_NAME} ({', '.join(map(_quote, self.fieldnames))}) "
+                        f"VALUES ({', '.join('?' * len(self.fieldnames))})")
+
+    def write(self, row):
+        self._batch.append(tuple(_typed(name, row.get(name)) for name in self.fieldnames))
+        self.rows_written += 1
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self, sync=False):
+        if self._batch:
+            with self.conn:  # One transaction per batch
+                self.conn.executemany(self._insert, self._batch)
+            self._batch = []
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetSink:
+    """
+    Write rows to a Parquet file, one row group per ``row_group_size`` rows.
+
+    Only ``row_group_size`` rows are held in memory; the file is readable once
+    the sink is closed.
+    """
+
+    def __init__(self, path, fieldnames, row_group_size=10000):
+        pa, pq = require_pyarrow()
+        self.pa = pa
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._rows = []
+        fields = []
+        for name in self.fieldnames:
+            if name in INTEGER_FIELDS:
+                fields.append(pa.field(name, pa.int64()))
+            elif name in FLOAT_FIELDS:
+                fields.append(pa.field(name, pa.float64()))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, row):
+        self._rows.append({name: _typed(name, row.get(name)) for name in self.fieldnames})
+        self.rows_written += 1
+        if len(self._rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self, sync=False):
+        if self._rows:
+            self.writer.write_table(self.pa.Table.from_pylist(self._rows, schema=self.schema))
+            self._rows = []
+
+    def close(self):
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_sink(output_format, path, fieldnames, flush_every=100, fsync_interval=5.0):
+    """
+    Create the sink for ``output_format``, one of ``OUTPUT_FORMATS``.
+
+    ``flush_every`` and ``fsync_interval`` apply to CSV; SQLite and Parquet
+    write in their own larger batches.
+    """
+    if output_format == 'csv':
+        return CSVStreamWriter(path, fieldnames, flush_every, fsync_interval)
+    if output_format == 'sqlite':
+        return SQLiteSink(path, fieldnames)
+    if output_format == 'parquet':
+        return ParquetSink(path, fieldnames)
+    raise ValueError(f"Unknown output format: {output_format}")
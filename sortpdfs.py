@@ -1,55 +1,201 @@
 import os
+import errno
 import shutil
-import fitz  # PyMuPDF
+import filecmp
+import itertools
 import logging
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import fitz  # PyMuPDF
+from extract import (CSV_NAME, STREAM_CHUNKSIZE, CSVStreamWriter, ErrorLog, extract_from_doc,
+                     load_bbox_dict, open_pdf)
+from discover import iter_pdf_files
+from layouts import LayoutSet
+from pagesize import page_size_class
+from pagesize import PAGE_SIZES, match_page_size as _match_page_size  # noqa: F401
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
-# Common page sizes in points (1 pt = 1/72 inch)
-PAGE_SIZES = {
-    'A0': (2384, 3370),
-    'A1': (1684, 2384),
-    'A2': (1191, 1684),
-    'A3': (842, 1191),
-    'A4': (595, 842),
-}
+# How a sorted file gets into its folder. 'hardlink' and 'move' need the
+# output on the same filesystem; 'reflink' shares blocks on filesystems that
+# support it (btrfs, XFS on Linux) and falls back to a copy elsewhere
+PLACE_MODES = ('copy', 'hardlink', 'reflink', 'move')
+PLACE_VERBS = {'copy': 'Copied', 'hardlink': 'Linked', 'reflink': 'Cloned', 'move': 'Moved'}
 
+FICLONE = 0x40049409  # Linux ioctl that clones one file's extents into another
 
-def main(source_dir: str, output_dir: str):
+
+def main(source_dir: str, output_dir: str, mode: str = 'copy', processes: int = None,
+         max_in_flight: int = 16, bbox=None, csv_path: str = None, recursive: bool = False,
+         include=(), exclude=()):
     """
     Main function to walk through a directory of PDFs and DWGs
     and sort PDFs based on size, orientation, and page count.
+
+    Files are streamed to a process pool for classification as the source
+    folder is listed, and a small thread pool places them, with at most
+    ``max_in_flight`` copies pending at once.
+
+    Args:
+        mode (str): One of ``PLACE_MODES``.
+        processes (int): Worker processes. Defaults to ``multiprocessing.cpu_count()``.
+        max_in_flight (int): Maximum files classified but not yet placed.
+        bbox (str | dict): Bounding box JSON (or loaded dict). When given, the
+            title block is extracted from the same open document and written
+            to ``csv_path`` once the file is placed, under the name it was
+            placed as and with its folder. Files skipped as identical to one
+            already in place get no row. With per-page-class ``_layouts`` the
+            first page picks the layout.
+        csv_path (str): Output CSV for ``bbox``. Defaults to
+            ``extracted_text.csv`` in ``output_dir``.
+        recursive (bool): Sort PDFs from subfolders too. The output folder is
+            skipped if it lies inside ``source_dir``.
+        include (list): Globs a file must match (see ``discover.py``).
+        exclude (list): Globs for files and folders to skip.
+
+    Returns:
+        dict: ``files``, ``sorted``, ``skipped`` (identical file already in
+        place), ``errors`` and ``csv_path`` (or None).
     """
+    summary = {'files': 0, 'sorted': 0, 'skipped': 0, 'errors': 0, 'csv_path': None}
     if not os.path.isdir(source_dir):
         logging.error(f"Source directory does not exist: {source_dir}")
-        return
+        return summary
+    if mode not in PLACE_MODES:
+        raise ValueError(f"Unknown mode: {mode}")
 
     os.makedirs(output_dir, exist_ok=True)
 
-    for filename in os.listdir(source_dir):
-        filepath = os.path.join(source_dir, filename)
+    def skip(filepath):
+        filename = os.path.basename(filepath)
+        if os.path.splitext(filename)[1].lower() == '.dwg':
+            logging.info(f"Skipping DWG (not supported yet): {filename}")
+        else:
+            logging.warning(f"Unsupported file type: {filename}")
+
+    exclude = list(exclude)
+    rel_output = os.path.relpath(os.path.abspath(output_dir), os.path.abspath(source_dir))
+    if not rel_output.startswith(os.pardir):
+        exclude.append(rel_output.replace(os.sep, '/'))
+    pdf_files = iter_pdf_files(source_dir, recursive, include, exclude, on_other=skip,
+                               on_error=lambda e: logging.error(f"Cannot read folder: {e}"))
+
+    bbox_dict = load_bbox_dict(bbox) if isinstance(bbox, str) else bbox
+    layouts = LayoutSet(bbox_dict) if bbox_dict is not None else None
+    writer = error_log = None
+    if layouts is not None:
+        summary['csv_path'] = csv_path or os.path.join(output_dir, CSV_NAME)
+        header = ['filename', 'folder'] + (['layout'] if layouts.multi else []) + layouts.fieldnames
+        writer = CSVStreamWriter(summary['csv_path'], header)
+        error_log = ErrorLog(summary['csv_path'])
+
+    processes = processes or multiprocessing.cpu_count()
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    lock = threading.Lock()
+    created = set()
+
+    def place(filepath, folder_name, row):
+        try:
+            destination = place_file(filepath, os.path.join(output_dir, folder_name), mode)
+            name = os.path.basename(filepath)
+            if destination is None:
+                logging.info(f"Skipped '{name}': an identical file is already in {folder_name}")
+                with lock:
+                    summary['skipped'] += 1
+                return
+            placed_as = os.path.basename(destination)
+            logging.info(f"{PLACE_VERBS[mode]} '{name}' → {folder_name}"
+                         + (f" as '{placed_as}'" if placed_as != name else ''))
+            with lock:
+                summary['sorted'] += 1
+                if row is not None:
+                    # The row names the file as it ended up on disk
+                    row['filename'] = placed_as
+                    if 'error' in row:
+                        error_log.write(row['error'])
+                    writer.write(row)
+        except Exception as e:
+            logging.error(f"Failed to {mode} {os.path.basename(filepath)}: {e}")
+            with lock:
+                summary['errors'] += 1
+        finally:
+            in_flight.release()
 
-        if os.path.isfile(filepath):
-            ext = os.path.splitext(filename)[1].lower()
+    with multiprocessing.Pool(processes, _init_worker, (layouts,)) as pool, \
+            ThreadPoolExecutor(max_workers=min(max_in_flight, 8)) as placer:
+        try:
+            for filepath, folder_name, row, error in pool.imap_unordered(_classify, pdf_files, STREAM_CHUNKSIZE):
+                summary['files'] += 1
+                if error:
+                    logging.error(f"Failed to process {os.path.basename(filepath)}: {error}")
+                    with lock:
+                        summary['errors'] += 1
+                    continue
 
-            if ext == '.pdf':
+                if folder_name not in created:
+                    os.makedirs(os.path.join(output_dir, folder_name), exist_ok=True)
+                    created.add(folder_name)
+                # Blocks here, not in memory, when placement falls behind
+                in_flight.acquire()
+                placer.submit(place, filepath, folder_name, row)
+        finally:
+            placer.shutdown(wait=True)  # Their rows must be in before the CSV closes
+            if writer is not None:
+                writer.close()
+                error_log.close()
+    return summary
+
+
+# Per-worker state set once by the pool initializer
+_worker = {}
+
+
+def _init_worker(layouts):
+    _worker['layouts'] = layouts
+    _worker['rects'] = {}  # Layout name -> rect cache
+
+
+def _classify(filepath):
+    """
+    Worker: open a PDF once, classify it and, in combined mode, extract its title block.
+
+    Returns:
+        tuple: (filepath, folder_name, row or None, error or None)
+    """
+    layouts = _worker['layouts']
+    try:
+        with open_pdf(filepath) as doc:
+            folder_name = classify_pdf(doc)
+            row = None
+            if layouts is not None:
+                row = {'filename': os.path.basename(filepath), 'folder': folder_name}
                 try:
-                    process_pdf(filepath, output_dir)
+                    page = doc.load_page(0)
+                    layout_name = layouts.select(page_size_class(page.rect.width, page.rect.height))
+                    if layout_name is not None:
+                        areas, anchor = layouts.areas(layout_name)
+                        rects = _worker['rects'].setdefault(layout_name, {})
+                        row['layout'] = layout_name
+                        row.update(extract_from_doc(doc, areas, rects, anchor=anchor, page=page))
                 except Exception as e:
-                    logging.error(f"Failed to process {filename}: {e}")
-            elif ext == '.dwg':
-                logging.info(f"Skipping DWG (not supported yet): {filename}")
-            else:
-                logging.warning(f"Unsupported file type: {filename}")
+                    row['error'] = f"{e} (file: {filepath})"
+    except Exception as e:
+        return filepath, None, None, str(e)
+    return filepath, folder_name, row, None
 
 
-def process_pdf(filepath: str, output_base: str):
+def classify_pdf(doc) -> str:
     """
-    Process a PDF to determine its page size, orientation, and page count.
-    Moves it to the appropriate subfolder.
+    Determine an open PDF's page size, orientation, and page count
+    and return the name of the folder it belongs in.
     """
-    doc = fitz.open(filepath)
     page_count = doc.page_count
 
     first_page = doc.load_page(0)
@@ -59,13 +205,90 @@ def process_pdf(filepath: str, output_base: str):
     orientation = 'LS' if width > height else 'PO'
     count_label = 'Single' if page_count == 1 else 'Multi'
 
-    folder_name = f"{page_size}_{orientation}_{count_label}"
-    destination_folder = os.path.join(output_base, folder_name)
+    return f"{page_size}_{orientation}_{count_label}"
 
+
+def process_pdf(filepath: str, output_base: str, mode: str = 'copy'):
+    """
+    Process a PDF to determine its page size, orientation, and page count.
+    Moves it to the appropriate subfolder.
+    """
+    with fitz.open(filepath) as doc:
+        folder_name = classify_pdf(doc)
+    place_file(filepath, os.path.join(output_base, folder_name), mode)
+    logging.info(f"{PLACE_VERBS[mode]} '{os.path.basename(filepath)}' → {folder_name}")
+
+
+def _candidates(destination):
+    """``name.pdf``, then ``name_2.pdf``, ``name_3.pdf``, ..."""
+    yield destination
+    base, ext = os.path.splitext(destination)
+    for n in itertools.count(2):
+        yield f"{base}_{n}{ext}"
+
+
+def place_file(filepath: str, destination_folder: str, mode: str = 'copy'):
+    """
+    Put a file into ``destination_folder`` by copying, hard-linking,
+    reflinking, or moving it.
+
+    Existing files are never replaced: same-name files from different source
+    folders are common with recursive sorting, so a file whose name is taken
+    by different content is placed as ``name_2.pdf`` (``name_3.pdf``, ...).
+    A byte-identical file already in place (e.g. from an earlier run) is left
+    alone and so is the source, also in ``'move'`` mode.
+
+    Returns:
+        str: The path the file was placed at, or None if it was skipped.
+    """
+    if mode not in PLACE_MODES:
+        raise ValueError(f"Unknown mode: {mode}")
     os.makedirs(destination_folder, exist_ok=True)
 
-    shutil.copy(filepath, os.path.join(destination_folder, os.path.basename(filepath)))
-    logging.info(f"Moved '{os.path.basename(filepath)}' → {folder_name}")
+    for destination in _candidates(os.path.join(destination_folder, os.path.basename(filepath))):
+        if os.path.lexists(destination) and filecmp.cmp(filepath, destination, shallow=False):
+            return None
+        try:
+            if mode == 'hardlink':
+                os.link(filepath, destination)  # Fails instead of replacing
+                return destination
+            # Claim the name first, so concurrent placements never share it
+            with open(destination, 'xb'):
+                pass
+        except FileExistsError:
+            continue
+        break
+
+    try:
+        if mode == 'copy':
+            shutil.copy(filepath, destination)
+        elif mode == 'move':
+            shutil.move(filepath, destination)
+        elif not reflink(filepath, destination):
+            shutil.copy(filepath, destination)
+    except BaseException:
+        if os.path.exists(filepath):
+            os.remove(destination)  # Only the name claimed above
+        raise
+    return destination
+
+
+def reflink(src: str, dst: str) -> bool:
+    """
+    Clone ``src`` to ``dst`` sharing its data blocks (copy-on-write).
+    Returns False if the platform or filesystem cannot do it.
+    """
+    if fcntl is None:
+        return False
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError as e:
+            if e.errno in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.EBADF):
+                return False
+            raise
+    shutil.copymode(src, dst)
+    return True
 
 
 def match_page_size(width: float, height: float) -> str:
@@ -73,23 +296,40 @@ def match_page_size(width: float, height: float) -> str:
     Match the page dimensions to the nearest standard A-size.
     Uses tolerance to handle minor variation in measurement.
     """
-    tolerance = 10  # pts
-
-    for size, (w, h) in PAGE_SIZES.items():
-        if (abs(width - w) < tolerance and abs(height - h) < tolerance) or \
-           (abs(width - h) < tolerance and abs(height - w) < tolerance):
-            return size
-
-    logging.warning(f"Unknown page size: {int(width)} x {int(height)}")
-    return "Unknown"
+    size = _match_page_size(width, height)
+    if size == "Unknown":
+        logging.warning(f"Unknown page size: {int(width)} x {int(height)}")
+    return size
 
 
 if __name__ == '__main__':
     import argparse
 
+    multiprocessing.freeze_support()
+
     parser = argparse.ArgumentParser(description="Sort PDFs by page size, orientation, and count.")
     parser.add_argument("source", help="Directory containing PDFs to process")
     parser.add_argument("output", help="Directory to move sorted PDFs into")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Sort PDFs in subfolders too")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="Only sort files matching this glob (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Skip files and folders matching this glob (repeatable)")
+    parser.add_argument("--mode", choices=PLACE_MODES, default='copy',
+                        help="How files are placed: copy, hardlink, reflink (copy-on-write clone, "
+                             "falls back to copy) or move (default: copy)")
+    parser.add_argument("-j", "--processes", type=int, help="Number of worker processes")
+    parser.add_argument("--max-in-flight", type=int, default=16,
+                        help="Maximum files waiting to be placed (default: 16)")
+    parser.add_argument("--extract", metavar="BBOX_JSON",
+                        help="Also extract the title block with this layout while each file is open")
+    parser.add_argument("--csv", help=f"Output CSV for --extract (default: {CSV_NAME} in the output folder)")
 
     args = parser.parse_args()
-    main(args.source, args.output)
+    summary = main(args.source, args.output, mode=args.mode, processes=args.processes,
+                   max_in_flight=args.max_in_flight, bbox=args.extract, csv_path=args.csv,
+                   recursive=args.recursive, include=args.include, exclude=args.exclude)
+    logging.info(f"Sorted {summary['sorted']} of {summary['files']} PDF(s), {summary['errors']} error(s)"
+                 + (f", {summary['skipped']} already in place" if summary['skipped'] else ''))
+    if summary['csv_path']:
+        logging.info(f"Saved extracted text to {summary['csv_path']}")
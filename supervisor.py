@@ -0,0 +1,273 @@
+"""
+Supervised worker pool with per-task timeouts, memory ceilings and recycling.
+
+``multiprocessing.Pool`` cannot abandon a task once a worker has started it,
+so a single malformed PDF that hangs MuPDF stalls the whole run. Here every
+worker owns a pipe and runs one task at a time; the supervisor kills and
+replaces a worker whose task exceeds the wall-clock timeout or whose RSS
+grows past the ceiling, and reports the task through ``on_failure`` instead
+of waiting for it.
+"""
+import os
+import mmap
+import time
+import queue
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+
+_DONE = object()
+
+
+def process_rss(pid):
+    """Resident set size of a process in bytes, or None where /proc is unavailable."""
+    try:
+        with open(f'/proc/{pid}/statm', 'rb') as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _worker_main(conn, func, initializer, initargs, maxtasks, max_rss):
+    if initializer is not None:
+        initializer(*initargs)
+    completed = 0
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        try:
+            ok, result = True, func(task)
+        except Exception as e:
+            ok, result = False, f"worker raised {e!r}"
+        completed += 1
+        # Retire to be replaced by a fresh process rather than keep a bloated
+        # heap; the flag tells the supervisor not to send another task
+        retiring = bool((maxtasks and completed >= maxtasks) or
+                        (max_rss and (process_rss(os.getpid()) or 0) > max_rss))
+        conn.send((ok, result, retiring))
+        if retiring:
+            return
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.task = None
+        self.started = None
+
+
+class SupervisedPool:
+    """
+    Process pool that never lets one task block the run.
+
+    Args:
+        processes (int): Number of workers. Defaults to ``multiprocessing.cpu_count()``.
+        initializer (callable): Run once in every worker, including replacements.
+        initargs (tuple): Arguments for ``initializer``.
+        timeout (float): Wall-clock seconds a task may run before its worker is killed.
+        max_rss (int): Bytes of resident memory a worker may use. Workers above it
+            are killed mid-task, or recycled after finishing one. Linux only.
+        maxtasksperchild (int): Recycle each worker after this many tasks.
+        on_failure (callable): ``on_failure(task, reason)`` returns the result
+            to yield for a task that timed out, hit the memory ceiling, crashed
+            its worker or raised. Defaults to raising ``RuntimeError``.
+        poll_interval (float): Seconds between deadline and memory checks.
+    """
+
+    def __init__(self, processes=None, initializer=None, initargs=(), timeout=None,
+                 max_rss=None, maxtasksperchild=None, on_failure=None, poll_interval=0.25):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.initializer = initializer
+        self.initargs = initargs
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.maxtasksperchild = maxtasksperchild
+        self.on_failure = on_failure or self._raise
+        self.poll_interval = poll_interval
+        self.workers = []
+        self.recycled = 0
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _raise(task, reason):
+        raise RuntimeError(f"Task failed: {reason}")
+
+    def _spawn(self, func):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, func, self.initializer, self.initargs, self.maxtasksperchild, self.max_rss),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self.workers.append(worker)
+        return worker
+
+    def _retire(self, worker, kill=False):
+        if kill and worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        self.workers.remove(worker)
+        self.recycled += 1
+
+    def _receive(self, worker, func):
+        """
+        Read a worker's result and free it for the next task.
+
+        Returns:
+            tuple: (received, result) where ``received`` is False if the
+            worker died without sending one.
+        """
+        try:
+            ok, result, retiring = worker.conn.recv()
+        except (EOFError, OSError):
+            return False, None
+        task, worker.task = worker.task, None
+        if retiring:
+            self._retire(worker)
+            self._spawn(func)
+        return True, result if ok else self.on_failure(task, result)
+
+    def _feed(self, iterable, tasks, stop):
+        # Runs in its own thread, like Pool's task handler, so a blocking
+        # iterable (e.g. a reorder window) never stalls result collection
+        try:
+            for task in iterable:
+                if not self._put(tasks, task, stop):
+                    return
+        finally:
+            self._put(tasks, _DONE, stop)
+
+    def _put(self, tasks, item, stop):
+        while not stop.is_set():
+            try:
+                tasks.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def imap_unordered(self, func, iterable, chunksize=1, idle=False):
+        """
+        Yield ``func(task)`` for every task as it completes.
+
+        ``chunksize`` is accepted for ``Pool`` compatibility and ignored: tasks
+        are dispatched one at a time so each gets its own deadline. With
+        ``idle`` a None is yielded after every poll that produced no result,
+        so the caller can do other work while it waits.
+        """
+        # A fresh stop event per call, so the pool can run several batches
+        stop = self._stop = threading.Event()
+        tasks = queue.Queue(maxsize=self.processes * 2)
+        feeder = threading.Thread(target=self._feed, args=(iterable, tasks, stop), daemon=True)
+        feeder.start()
+        for _ in range(self.processes):
+            self._spawn(func)
+
+        more_input = True
+        try:
+            while True:
+                produced = False
+                # Hand out work to idle workers
+                for worker in list(self.workers):
+                    if not more_input:
+                        break
+                    if worker.task is not None:
+                        continue
+                    busy = any(w.task is not None for w in self.workers)
+                    try:
+                        # Only block for input when there are no results to collect
+                        task = tasks.get_nowait() if busy else tasks.get(timeout=self.poll_interval)
+                    except queue.Empty:
+                        break
+                    if task is _DONE:
+                        more_input = False
+                        break
+                    worker.conn.send(task)
+                    worker.task = task
+                    worker.started = time.monotonic()
+
+                busy_workers = [w for w in self.workers if w.task is not None]
+                if not more_input and not busy_workers:
+                    return
+                if not busy_workers:
+                    if idle:
+                        yield None
+                    continue
+
+                ready = wait([w.conn for w in busy_workers] + [w.process.sentinel for w in busy_workers],
+                             self.poll_interval)
+
+                for worker in busy_workers:
+                    if worker.conn in ready:
+                        received, result = self._receive(worker, func)
+                        if received:  # Otherwise it died mid-task; handled below
+                            produced = True
+                            yield result
+
+                now = time.monotonic()
+                for worker in list(self.workers):
+                    if worker.task is None:
+                        if not worker.process.is_alive():
+                            # Died while idle; replace it
+                            self._retire(worker)
+                            self._spawn(func)
+                        continue
+                    reason = None
+                    if not worker.process.is_alive():
+                        reason = f"worker exited with code {worker.process.exitcode}"
+                    elif self.timeout and now - worker.started > self.timeout:
+                        reason = f"timed out after {self.timeout:g}s"
+                    elif self.max_rss:
+                        rss = process_rss(worker.process.pid)
+                        if rss and rss > self.max_rss:
+                            reason = f"exceeded memory limit ({rss / 2**20:.0f} MB)"
+                    if reason and worker.conn.poll():
+                        # The result arrived since the wait() above, e.g. from a
+                        # retiring worker that exits right after sending it
+                        received, result = self._receive(worker, func)
+                        if received:
+                            produced = True
+                            yield result
+                            continue
+                    if reason:
+                        task = worker.task
+                        self._retire(worker, kill=True)
+                        self._spawn(func)
+                        produced = True
+                        yield self.on_failure(task, reason)
+                if idle and not produced:
+                    yield None
+        finally:
+            stop.set()
+            self.terminate()
+
+    def terminate(self):
+        for worker in list(self.workers):
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        deadline = time.monotonic() + 1.0
+        for worker in list(self.workers):
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+        self.workers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self.terminate()
@@ -0,0 +1,87 @@
+import csv
+import json
+
+import fitz
+import pytest
+
+from extract import PAGES_PER_TASK, extract
+
+BBOX = {'title': [50, 50, 300, 80]}
+LAYOUTS = {'_layouts': {'default': BBOX}}
+
+
+@pytest.fixture(params=[BBOX, LAYOUTS], ids=['plain', 'layouts'])
+def drawing_set(tmp_path, request):
+    folder = tmp_path / 'pdfs'
+    folder.mkdir()
+    doc = fitz.open()
+    for page_no in range(3):
+        page = doc.new_page(width=842, height=595)
+        page.insert_text((60, 70), f"Sheet {page_no + 1}")
+    doc.save(str(folder / 'set.pdf'))
+    bbox_path = tmp_path / 'bbox.json'
+    bbox_path.write_text(json.dumps(request.param))
+    return folder, str(bbox_path)
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def test_unreadable_page_is_reported_with_cache(drawing_set, tmp_path, monkeypatch):
+    # The pool forks, so the workers inherit the patched method
+    load_page = fitz.Document.load_page
+
+    def failing_load_page(doc, page_no=0):
+        if page_no == 1:
+            raise RuntimeError("broken page")
+        return load_page(doc, page_no)
+
+    monkeypatch.setattr(fitz.Document, 'load_page', failing_load_page)
+    folder, bbox = drawing_set
+    csv_path = str(tmp_path / 'out.csv')
+    summary = extract(str(folder), bbox, csv_path, processes=1, pages='all', cache=True, metadata=True)
+
+    rows = read_rows(csv_path)
+    assert summary['errors'] == 1
+    assert [row['title'] for row in rows] == ['Sheet 1', '', 'Sheet 3']
+    assert 'broken page' in rows[1]['error']
+
+
+def test_long_set_is_split_over_tasks_and_written_in_page_order(tmp_path):
+    folder = tmp_path / 'pdfs'
+    folder.mkdir()
+    n_pages = PAGES_PER_TASK * 3 + 1
+    doc = fitz.open()
+    for page_no in range(n_pages):
+        page = doc.new_page(width=842, height=595)
+        page.insert_text((60, 70), f"Sheet {page_no + 1}")
+    doc.save(str(folder / 'set.pdf'))
+    csv_path = str(tmp_path / 'out.csv')
+    extract(str(folder), dict(LAYOUTS), csv_path, processes=2, pages='all', metadata=True)
+
+    rows = read_rows(csv_path)
+    assert [row['page'] for row in rows] == [str(n + 1) for n in range(n_pages)]
+    assert [row['title'] for row in rows] == [f"Sheet {n + 1}" for n in range(n_pages)]
+
+
+def test_duplicate_rows_follow_the_original_file(drawing_set, tmp_path):
+    folder, bbox = drawing_set
+    (folder / 'copy.pdf').write_bytes((folder / 'set.pdf').read_bytes())
+    csv_path = str(tmp_path / 'out.csv')
+    summary = extract(str(folder), bbox, csv_path, processes=1, pages='all', dedup=True)
+
+    rows = read_rows(csv_path)
+    assert summary['duplicates'] == 1
+    assert [(row['filename'], row['page']) for row in rows] == [
+        ('copy.pdf', '1'), ('copy.pdf', '2'), ('copy.pdf', '3'),
+        ('set.pdf', '1'), ('set.pdf', '2'), ('set.pdf', '3'),
+    ]
+
+
+def test_invalid_argument_leaves_no_cache_file(drawing_set, tmp_path):
+    folder, bbox = drawing_set
+    with pytest.raises(ValueError):
+        extract(str(folder), bbox, str(tmp_path / 'out.csv'), cache=True, engine='unknown')
+    assert not (tmp_path / 'out_cache.sqlite').exists()
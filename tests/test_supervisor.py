@@ -0,0 +1,16 @@
+from supervisor import SupervisedPool
+
+
+def _square(n):
+    return n * n
+
+
+def test_recycled_workers_never_lose_results():
+    # Workers retire after every third task and exit right after sending
+    # the result; none of those results may be reported as a failure
+    failures = []
+    pool = SupervisedPool(4, maxtasksperchild=3, on_failure=lambda task, reason: failures.append((task, reason)))
+    with pool:
+        results = [result for result in pool.imap_unordered(_square, range(200)) if result is not None]
+    assert failures == []
+    assert sorted(results) == [n * n for n in range(200)]
@@ -0,0 +1,181 @@
+"""
+Answer many bbox queries from a single pass over a page's text.
+
+``page.get_textbox(rect)`` builds and walks the whole text page for every
+area, so a title block with 30 fields parses the page 30 times. A
+``TextIndex`` builds the text page once, bins its characters (or words) into
+a uniform grid and answers each area from the few cells it covers.
+
+Granularity ``'chars'`` reproduces ``get_textbox`` exactly: a character is
+selected when its bbox overlaps the area, characters of one line are
+concatenated and lines are separated by newlines. ``'words'`` selects whole
+words that overlap the area and joins them with spaces; it is cheaper to
+build but can differ from ``get_textbox`` at area edges.
+
+For layouts with a hundred or more areas, ``assign_words`` puts all words and
+areas into NumPy arrays and computes every word/area overlap in one broadcast.
+NumPy is only imported when that engine is used.
+"""
+from collections import defaultdict
+
+DEFAULT_CELL_SIZE = 36  # pt; about half an inch, a few text lines per cell
+
+# 'textbox' calls page.get_textbox per area; 'index' builds the text page once
+# and matches get_textbox exactly; 'words' selects whole words from a grid;
+# 'numpy' assigns whole words to all areas in one vectorized pass
+ENGINES = ('textbox', 'index', 'words', 'numpy')
+
+
+def require_numpy():
+    """Import NumPy on first use of the ``'numpy'`` engine."""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("The 'numpy' engine requires NumPy (pip install numpy)") from None
+    return numpy
+
+
+class TextIndex:
+    """Uniform grid over the characters or words of one page."""
+
+    def __init__(self, page, textpage=None, granularity='chars', cell_size=DEFAULT_CELL_SIZE):
+        if granularity not in ('chars', 'words'):
+            raise ValueError(f"Unknown granularity: {granularity}")
+        self.granularity = granularity
+        self.cell_size = cell_size
+        if textpage is None:
+            textpage = page.get_textpage()
+
+        # Parallel lists: bbox, text and line id per item, in reading order
+        self.boxes = []
+        self.texts = []
+        self.lines = []
+        if granularity == 'chars':
+            self._load_chars(textpage)
+        else:
+            self._load_words(textpage)
+
+        self.grid = defaultdict(list)
+        for i, box in enumerate(self.boxes):
+            for cell in self._cells(box):
+                self.grid[cell].append(i)
+
+    def _load_chars(self, textpage):
+        line_id = 0
+        for block in textpage.extractRAWDICT()['blocks']:
+            if block['type'] != 0:
+                continue
+            for line in block['lines']:
+                for span in line['spans']:
+                    for ch in span['chars']:
+                        self.boxes.append(tuple(ch['bbox']))
+                        self.texts.append(ch['c'])
+                        self.lines.append(line_id)
+                line_id += 1
+
+    def _load_words(self, textpage):
+        for x0, y0, x1, y1, word, block_no, line_no, _ in textpage.extractWORDS():
+            self.boxes.append((x0, y0, x1, y1))
+            self.texts.append(word)
+            self.lines.append((block_no, line_no))
+
+    def _cells(self, box):
+        x0, y0, x1, y1 = box
+        size = self.cell_size
+        for cx in range(int(x0 // size), int(x1 // size) + 1):
+            for cy in range(int(y0 // size), int(y1 // size) + 1):
+                yield cx, cy
+
+    def query(self, rect):
+        """Return the text inside ``rect`` in the same layout as ``get_textbox``."""
+        ax0, ay0, ax1, ay1 = rect
+        boxes = self.boxes
+        hits = set()
+        for cell in self._cells((ax0, ay0, ax1, ay1)):
+            for i in self.grid.get(cell, ()):
+                x0, y0, x1, y1 = boxes[i]
+                # Same strict overlap test as MuPDF's copy-rectangle
+                if ax0 < x1 and ay0 < y1 and ax1 > x0 and ay1 > y0:
+                    hits.add(i)
+
+        joiner = '' if self.granularity == 'chars' else ' '
+        out_lines = []
+        current_line = None
+        for i in sorted(hits):
+            if self.lines[i] != current_line:
+                out_lines.append([])
+                current_line = self.lines[i]
+            out_lines[-1].append(self.texts[i])
+        return '\n'.join(joiner.join(parts) for parts in out_lines)
+
+
+def assign_words(words, rects, min_overlap=0.0):
+    """
+    Assign words to areas with one NumPy broadcast over all word/area pairs.
+
+    Args:
+        words (list): ``extractWORDS`` tuples (x0, y0, x1, y1, word, block, line, word_no)
+            in reading order.
+        rects (dict): Area name -> (x0, y0, x1, y1).
+        min_overlap (float): Fraction of a word's bbox that must lie inside an
+            area. 0 selects any word that overlaps the area at all.
+
+    Returns:
+        dict: Area name -> text, words joined by spaces and lines by newlines.
+    """
+    np = require_numpy()
+    names = list(rects)
+    if not words or not names:
+        return {name: '' for name in names}
+
+    w = np.array([word[:4] for word in words], dtype=float)           # (N, 4)
+    a = np.array([tuple(rects[name]) for name in names], dtype=float)  # (M, 4)
+
+    # (N, M) intersection extents
+    iw = np.minimum(w[:, None, 2], a[None, :, 2]) - np.maximum(w[:, None, 0], a[None, :, 0])
+    ih = np.minimum(w[:, None, 3], a[None, :, 3]) - np.maximum(w[:, None, 1], a[None, :, 1])
+    hit = (iw > 0) & (ih > 0)
+    if min_overlap > 0:
+        word_area = (w[:, 2] - w[:, 0]) * (w[:, 3] - w[:, 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.clip(iw, 0, None) * np.clip(ih, 0, None) / word_area[:, None]
+        hit &= ratio >= min_overlap
+
+    # Pairs come out grouped by area, words in reading order within each area
+    area_idx, word_idx = np.nonzero(hit.T)
+    texts = {name: '' for name in names}
+    bounds = np.searchsorted(area_idx, np.arange(len(names) + 1))
+    for j, name in enumerate(names):
+        out_lines = []
+        current_line = None
+        for i in word_idx[bounds[j]:bounds[j + 1]]:
+            word = words[i]
+            if word[5:7] != current_line:
+                out_lines.append([])
+                current_line = word[5:7]
+            out_lines[-1].append(word[4])
+        texts[name] = '\n'.join(' '.join(parts) for parts in out_lines)
+    return texts
+
+
+def area_texts(page, rects, engine='textbox', min_overlap=0.0):
+    """
+    Return the text of every area on a page using the given engine.
+
+    Args:
+        page (fitz.Page): Page to read.
+        rects (dict): Area name -> fitz.Rect.
+        engine (str): One of ``ENGINES``.
+        min_overlap (float): Word overlap fraction for the ``'numpy'`` engine.
+
+    Returns:
+        dict: Area name -> text.
+    """
+    if engine == 'textbox':
+        return {name: page.get_textbox(rect) for name, rect in rects.items()}
+    if engine == 'numpy':
+        return assign_words(page.get_textpage().extractWORDS(), rects, min_overlap)
+    if engine in ('index', 'words'):
+        index = TextIndex(page, granularity='chars' if engine == 'index' else 'words')
+        return {name: index.query(rect) for name, rect in rects.items()}
+    raise ValueError(f"Unknown engine: {engine}")
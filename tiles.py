@@ -0,0 +1,105 @@
+"""
+Tiled rendering of the sample page for the area editor.
+
+The editor used to resize the whole page image on every pan and zoom step.
+Here the page, at the current zoom, is split into fixed-size tiles; only the
+tiles covering the viewport are rendered and the most recently used ones are
+kept, so panning mostly moves existing tiles and zooming renders just what is
+on screen. With a ``fitz.Page`` tiles are re-rendered from the page's display
+list at the zoomed resolution (sharp at any zoom); otherwise they are cropped
+from the base image and scaled.
+
+Tile coordinates are in the zoomed base image: at zoom ``z`` the page is
+``image.width * z`` by ``image.height * z`` pixels, exactly as ``PDFCropper``
+maps areas to the screen.
+"""
+from collections import OrderedDict
+from PIL import Image
+import fitz  # PyMuPDF
+
+TILE_SIZE = 256  # px
+MAX_TILES = 192  # About 36 MB of RGB tiles
+
+try:
+    RESAMPLE = Image.Resampling.LANCZOS
+except AttributeError:
+    RESAMPLE = Image.LANCZOS
+
+
+class TileCache:
+    """
+    LRU cache of rendered viewport tiles, keyed by zoom level and tile position.
+
+    Args:
+        image (PIL.Image): Base render of the page; its size defines zoom 1.0.
+        pdf_rect (tuple): Page rect the base image was rendered from.
+        page (fitz.Page): Render tiles from this page instead of scaling ``image``.
+        convert (callable): Applied to each rendered tile before it is cached,
+            e.g. ``ImageTk.PhotoImage``.
+        tile_size (int): Tile edge in pixels.
+        max_tiles (int): Tiles kept before the least recently used is evicted.
+    """
+
+    def __init__(self, image, pdf_rect, page=None, convert=None, tile_size=TILE_SIZE, max_tiles=MAX_TILES):
+        self.image = image
+        self.pdf_rect = fitz.Rect(pdf_rect)
+        self.display_list = page.get_displaylist() if page is not None else None
+        self.convert = convert
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+        self.rendered = 0
+
+    def zoomed_size(self, zoom):
+        return int(self.image.width * zoom), int(self.image.height * zoom)
+
+    def visible(self, zoom, offset_x, offset_y, view_width, view_height):
+        """Return the ``(tx, ty)`` of every tile that intersects the viewport."""
+        zoomed_w, zoomed_h = self.zoomed_size(zoom)
+        size = self.tile_size
+        x1 = min(offset_x + view_width, zoomed_w)
+        y1 = min(offset_y + view_height, zoomed_h)
+        return [(tx, ty)
+                for ty in range(max(0, offset_y) // size, (y1 - 1) // size + 1)
+                for tx in range(max(0, offset_x) // size, (x1 - 1) // size + 1)]
+
+    def get(self, zoom, tx, ty):
+        """Return the tile at ``(tx, ty)`` for ``zoom``, rendering it on a miss."""
+        key = (round(zoom, 6), tx, ty)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+        tile = self.render(zoom, tx, ty)
+        if self.convert is not None:
+            tile = self.convert(tile)
+        self.tiles[key] = tile
+        if len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return tile
+
+    def render(self, zoom, tx, ty):
+        """Render one tile as a PIL image, clipped to the page edge."""
+        self.rendered += 1
+        zoomed_w, zoomed_h = self.zoomed_size(zoom)
+        size = self.tile_size
+        px0, py0 = tx * size, ty * size
+        px1, py1 = min(px0 + size, zoomed_w), min(py0 + size, zoomed_h)
+
+        if self.display_list is None:
+            # Crop the matching region of the base image and scale only that
+            box = (px0 / zoom, py0 / zoom, px1 / zoom, py1 / zoom)
+            return self.image.resize((px1 - px0, py1 - py0), RESAMPLE, box=box)
+
+        r = self.pdf_rect
+        sx, sy = zoomed_w / r.width, zoomed_h / r.height
+        clip = fitz.Rect(r.x0 + px0 / sx, r.y0 + py0 / sy, r.x0 + px1 / sx, r.y0 + py1 / sy)
+        pix = self.display_list.get_pixmap(matrix=fitz.Matrix(sx, sy), clip=clip, alpha=False)
+        tile = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        if tile.size != (px1 - px0, py1 - py0):
+            # Pixmap edges are rounded outwards; keep tiles on the grid
+            tile = tile.crop((0, 0, px1 - px0, py1 - py0))
+        return tile
+
+    def clear(self):
+        self.tiles.clear()